@@ -10,6 +10,8 @@ from alembic import context
 # Import your models
 from app.db.base import Base
 from app.db.models import Tenant, MenuItem, Order  # noqa
+from app.core.migrations import list_tenant_schemas
+from app.core.seed_internal import create_tenant_tables
 
 # Alembic Config object
 config = context.config
@@ -43,8 +45,36 @@ def include_object_tenant(object, name, type_, reflected, compare_to):
     return True
 
 
+def migrate_tenant_schema(connection: Connection, schema: str) -> None:
+    print(f"Migrating schema: {schema}")
+
+    # Switch search path so Alembic 'sees' the blank tables as belonging to this schema
+    # However, Alembic prefers using schema_name in configure()
+
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        schema_name=schema,
+        include_object=include_object_tenant,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+        # Backfill tables added to the models since the schema was provisioned
+        connection.execute(text(f"SET search_path TO {schema}"))
+        create_tenant_tables(connection)
+        connection.execute(text("SET search_path TO public"))
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
+    # Set by app.core.migrations (parallel runner):
+    # - tenant_schema: migrate that single tenant schema only
+    # - skip_tenants: migrate the public schema only
+    tenant_schema = config.attributes.get("tenant_schema")
+    skip_tenants = config.attributes.get("skip_tenants", False)
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -52,6 +82,10 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        if tenant_schema:
+            migrate_tenant_schema(connection, tenant_schema)
+            return
+
         # 1. MIGRATE PUBLIC SCHEMA
         # We only look at tables defined with schema='public'
         context.configure(
@@ -64,30 +98,14 @@ def run_migrations_online() -> None:
         with context.begin_transaction():
             context.run_migrations()
 
+        if skip_tenants:
+            return
+
         # 2. MIGRATE TENANT SCHEMAS
-        # Fetch all schemas from the public.tenants table
-        # Note: In a real prod environment, you might want to use the worker for this.
-        try:
-            result = connection.execute(text("select schema_name from public.tenants"))
-            tenant_schemas = [row[0] for row in result]
-        except Exception:
-            tenant_schemas = []
-
-        for schema in tenant_schemas:
-            print(f"Migrating schema: {schema}")
-
-            # Switch search path so Alembic 'sees' the blank tables as belonging to this schema
-            # However, Alembic prefers using schema_name in configure()
-
-            context.configure(
-                connection=connection,
-                target_metadata=target_metadata,
-                schema_name=schema,
-                include_object=include_object_tenant,
-            )
-
-            with context.begin_transaction():
-                context.run_migrations()
+        # Sequential, on this connection. With many schemas, use the parallel
+        # and resumable runner instead: `python -m app.worker migrate`.
+        for schema in list_tenant_schemas(connection):
+            migrate_tenant_schema(connection, schema)
 
 
 if context.is_offline_mode():
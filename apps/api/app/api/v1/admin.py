@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import base64
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Tuple
 from uuid import UUID
 
-from app.db.session import get_db
 from app.db.models import (
     Category,
     MenuItem,
     ModifierGroup,
     ModifierOption,
+    Order,
     Tenant,
 )
 from app.schemas.menu import (
@@ -21,32 +25,25 @@ from app.schemas.menu import (
     ModifierGroupResponse,
     MenuItemReorder,
 )
-from app.api.v1.deps import get_current_user
+from app.schemas.order import OrderDetail
+from app.api.v1.deps import get_current_user, get_admin_db
+from app.db.session import get_tenant_db
 from app.core.config import settings
-from pydantic import BaseModel
-from sqlalchemy import text
+from app.core.tenant_cache import tenant_cache
+from app.core.menu_cache import menu_cache
+from pydantic import BaseModel, TypeAdapter
 
 router = APIRouter()
 
 
-# --- Helper to restore context ---
-def restore_tenant_context(db: Session, request: Request, current_user: dict):
-    """
-    Re-applies the search_path after a commit resets the transaction.
-    """
-    # Use the schema resolved by the dependency injection
-    schema = current_user.get("schema", "public")
-    db.execute(text(f"SET search_path TO {schema}, public"))
-
-
 # --- Categories ---
 
 
 @router.get("/categories", response_model=List[CategoryResponse])
 def list_categories(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_admin_db), current_user: dict = Depends(get_current_user)
 ):
-    # Note: deps.py sets the initial search_path.
+    # Note: deps.py binds the session to the tenant schema.
     return db.query(Category).order_by(Category.rank.asc()).all()
 
 
@@ -54,15 +51,14 @@ def list_categories(
 def create_category(
     request: Request,
     payload: CategoryCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     cat = Category(**payload.model_dump())
     db.add(cat)
 
     db.commit()
-    # Transaction closed. Re-apply context before refresh.
-    restore_tenant_context(db, request, current_user)
+    menu_cache.bump(current_user["schema"])
     db.refresh(cat)
     return cat
 
@@ -70,7 +66,7 @@ def create_category(
 @router.put("/categories/reorder")
 def reorder_categories(
     payload: List[CategoryReorder],
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -84,13 +80,14 @@ def reorder_categories(
             cat.rank = updates_map[cat.id]
 
     db.commit()
+    menu_cache.bump(current_user["schema"])
     return {"message": "Categories reordered successfully"}
 
 
 @router.delete("/categories/{cat_id}")
 def delete_category(
     cat_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     cat = db.query(Category).filter(Category.id == cat_id).first()
@@ -98,13 +95,14 @@ def delete_category(
         raise HTTPException(status_code=404, detail="Category not found")
     db.delete(cat)
     db.commit()
+    menu_cache.bump(current_user["schema"])
     return {"message": "Deleted"}
 
 
 # --- Menu Items ---
 @router.get("/items", response_model=List[MenuItemResponse])
 def list_items(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_admin_db), current_user: dict = Depends(get_current_user)
 ):
     return db.query(MenuItem).order_by(MenuItem.rank.asc()).all()
 
@@ -113,14 +111,14 @@ def list_items(
 def create_item(
     request: Request,
     payload: MenuItemCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     item = MenuItem(**payload.model_dump())
     db.add(item)
 
     db.commit()
-    restore_tenant_context(db, request, current_user)
+    menu_cache.bump(current_user["schema"])
     db.refresh(item)
     return item
 
@@ -128,7 +126,7 @@ def create_item(
 @router.put("/items/reorder")
 def reorder_items(
     payload: List[MenuItemReorder],
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -142,6 +140,7 @@ def reorder_items(
             item.rank = updates_map[item.id]
 
     db.commit()
+    menu_cache.bump(current_user["schema"])
     return {"message": "Items reordered successfully"}
 
 
@@ -150,7 +149,7 @@ def update_item(
     request: Request,
     item_id: UUID,
     payload: MenuItemCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
@@ -161,7 +160,7 @@ def update_item(
         setattr(item, key, value)
 
     db.commit()
-    restore_tenant_context(db, request, current_user)
+    menu_cache.bump(current_user["schema"])
     db.refresh(item)
     return item
 
@@ -169,7 +168,7 @@ def update_item(
 @router.delete("/items/{item_id}")
 def delete_item(
     item_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
@@ -178,6 +177,7 @@ def delete_item(
 
     db.delete(item)
     db.commit()
+    menu_cache.bump(current_user["schema"])
     return {"message": "Item deleted"}
 
 
@@ -186,7 +186,7 @@ def add_modifier_group(
     request: Request,
     item_id: UUID,
     payload: ModifierGroupCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
@@ -212,7 +212,7 @@ def add_modifier_group(
         )
 
     db.commit()
-    restore_tenant_context(db, request, current_user)
+    menu_cache.bump(current_user["schema"])
     db.refresh(group)
     return group
 
@@ -220,7 +220,7 @@ def add_modifier_group(
 @router.delete("/modifiers/{group_id}")
 def delete_modifier_group(
     group_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     group = db.query(ModifierGroup).filter(ModifierGroup.id == group_id).first()
@@ -229,6 +229,7 @@ def delete_modifier_group(
 
     db.delete(group)
     db.commit()
+    menu_cache.bump(current_user["schema"])
     return {"message": "Deleted"}
 
 
@@ -254,7 +255,7 @@ class ThemeConfigSchema(BaseModel):
 @router.get("/settings", response_model=ThemeConfigSchema)
 def get_tenant_settings(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     # This endpoint needs to find the Public Tenant record that corresponds to the
@@ -262,9 +263,7 @@ def get_tenant_settings(
 
     current_schema = current_user.get("schema")
 
-    # Switch to public to read Tenant config
-    db.execute(text("SET search_path TO public"))
-
+    # Tenant lives in the public schema (explicitly qualified on the model)
     tenant = db.query(Tenant).filter(Tenant.schema_name == current_schema).first()
 
     if not tenant:
@@ -276,9 +275,6 @@ def get_tenant_settings(
 
     config = tenant.theme_config or {}
 
-    # Restore context
-    db.execute(text(f"SET search_path TO {current_schema}, public"))
-
     default_hours = [
         {"label": "Mon - Fri", "time": "11:00 AM - 10:00 PM"},
         {"label": "Sat - Sun", "time": "10:00 AM - 11:00 PM"},
@@ -299,13 +295,11 @@ def get_tenant_settings(
 def update_tenant_settings(
     payload: ThemeConfigSchema,
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     current_user: dict = Depends(get_current_user),
 ):
     current_schema = current_user.get("schema")
 
-    db.execute(text("SET search_path TO public"))
-
     tenant = db.query(Tenant).filter(Tenant.schema_name == current_schema).first()
 
     if not tenant:
@@ -326,8 +320,138 @@ def update_tenant_settings(
     tenant.theme_config = new_config
 
     db.commit()
+    tenant_cache.invalidate(schema=current_schema)
     db.refresh(tenant)
 
-    db.execute(text(f"SET search_path TO {current_schema}, public"))
-
     return payload
+
+
+# --- Order History ---
+
+
+class OrderHistoryPage(BaseModel):
+    orders: List[OrderDetail]
+    # Pass back as `cursor` for the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+order_history_adapter = TypeAdapter(OrderDetail)
+
+# Plain column selects: rows don't enter the session's identity map
+ORDER_HISTORY_COLUMNS = (
+    Order.id,
+    Order.ticket_number,
+    Order.customer_name,
+    Order.table_number,
+    Order.status,
+    Order.total_amount,
+    Order.items,
+    Order.created_at,
+)
+
+
+def encode_cursor(created_at: datetime, order_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def order_history_query(
+    status: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    after: Optional[Tuple[datetime, UUID]],
+    limit: int,
+):
+    """
+    Newest first, keyset-paginated on (created_at, id) so every page is an
+    index range scan (ix_orders_created_at_id) regardless of its depth.
+    """
+    stmt = select(*ORDER_HISTORY_COLUMNS)
+    if status:
+        stmt = stmt.where(Order.status == status)
+    if start:
+        stmt = stmt.where(Order.created_at >= start)
+    if end:
+        stmt = stmt.where(Order.created_at < end)
+    if after:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < after)
+    return stmt.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)
+
+
+def _history_schema(current_user: dict) -> str:
+    schema = current_user["schema"]
+    if schema == "public":
+        raise HTTPException(status_code=400, detail="No tenant selected")
+    return schema
+
+
+@router.get("/orders/history", response_model=OrderHistoryPage)
+def get_order_history(
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_admin_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    One page of order history, optionally filtered by status and
+    created_at range ([start, end), UTC).
+    """
+    _history_schema(current_user)
+    after = decode_cursor(cursor) if cursor else None
+
+    rows = db.execute(order_history_query(status, start, end, after, limit)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return OrderHistoryPage(orders=rows, next_cursor=next_cursor)
+
+
+@router.get("/orders/export")
+def export_order_history(
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Streams every matching order as NDJSON (one order per line).
+    Rows are fetched in keyset batches, so memory stays constant however
+    much history the tenant has.
+    """
+    schema = _history_schema(current_user)
+    batch_size = settings.ORDER_EXPORT_BATCH_SIZE
+
+    def stream():
+        # Own session: request-scoped dependencies are closed before streaming
+        with get_tenant_db(schema) as db:
+            after = None
+            while True:
+                stmt = order_history_query(status, start, end, after, batch_size)
+                rows = db.execute(stmt).all()
+                # Short transactions between batches
+                db.rollback()
+                for row in rows:
+                    yield order_history_adapter.dump_json(
+                        order_history_adapter.validate_python(row, from_attributes=True)
+                    ) + b"\n"
+                if len(rows) < batch_size:
+                    return
+                after = (rows[-1].created_at, rows[-1].id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="orders.ndjson"'},
+    )
@@ -1,64 +1,60 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from jose import jwt, JWTError
 from typing import Dict, Any
-from app.db.session import get_db
+from app.db.session import get_db, bind_tenant
 from app.core.config import settings
-from app.db.models import Tenant
+from app.core.tenant_context import (
+    TenantContext,
+    get_tenant_context,
+    unresolved_tenant_error,
+)
 
 # Simplified OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 async def get_current_user(
-    request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme),
+    context: TenantContext = Depends(get_tenant_context),
 ) -> Dict[str, Any]:
     """
     Validates a locally signed Magic Token (HS256).
     Resolves Tenant Context (Schema) based on Host Header or Token Claims.
+    Both were already resolved by TenantMiddleware (request.state.tenant).
     """
 
     # --- 1. Validate Token (Local Only) ---
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-    except JWTError:
+    # `token` is the same bearer token the middleware verified
+    if context.claims is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Authentication Token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    payload = context.claims
 
     # --- 2. Tenant Context Resolution ---
-    host = request.headers.get("host", "").split(":")[0]
+    host = context.host
 
     # Initialize Tenant/Schema vars
     tenant = None
     target_schema = "public"
 
-    # Check for specific schema claim (Dynamic Demo Logic)
-    forced_schema = payload.get("target_schema")
-
     # A. Check for DEMO Override
-    if host == settings.DEMO_DOMAIN:
-        if forced_schema:
-            # The user has a personal sandbox assigned via their token
-            target_schema = forced_schema
-        else:
-            # Fallback to the generic read-only demo
-            target_schema = settings.DEMO_SCHEMA
+    if context.is_demo:
+        # Personal sandbox from the token, else the generic read-only demo
+        target_schema = context.schema_name
 
     else:
         # B. Standard Lookup (for pizza.localhost, etc.)
-        db.execute(text("SET search_path TO public"))
-        tenant = db.query(Tenant).filter(Tenant.domain == host).first()
+        if not context.resolved:
+            raise unresolved_tenant_error()
+        tenant = context.tenant
         if tenant:
             target_schema = tenant.schema_name
 
-    # --- 3. Authorization & Context Switch ---
+    # --- 3. Authorization & Context Resolution ---
 
     # Super Admin Check
     is_superuser = (
@@ -66,17 +62,15 @@ async def get_current_user(
         or payload.get("email") in settings.SUPER_ADMINS
     )
 
-    # Apply Database Schema Context
+    # Resolve Database Schema Context (applied by get_admin_db)
     if (
         tenant
         or target_schema.startswith("demo_")
         or target_schema == settings.DEMO_SCHEMA
     ):
-        db.execute(text(f"SET search_path TO {target_schema}, public"))
         current_schema = target_schema
     elif is_superuser and target_schema == "public":
         # Admin managing public tables
-        db.execute(text("SET search_path TO public"))
         current_schema = "public"
     else:
         # Unknown host
@@ -91,3 +85,13 @@ async def get_current_user(
         "schema": current_schema,
         "is_superuser": is_superuser,
     }
+
+
+def get_admin_db(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Session:
+    """
+    Sync session bound to the schema resolved by `get_current_user`.
+    """
+    return bind_tenant(db, current_user["schema"])
@@ -1,27 +1,46 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, Query, Request, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text, func
-from app.db.session import get_db
+from sqlalchemy import select
+from app.db.session import (
+    get_db,
+    get_async_db,
+    bind_tenant,
+    bind_tenant_async,
+    tenant_connection,
+)
 from app.db.models import (
-    Tenant,
     MenuItem,
     Order,
     Category,
     ModifierGroup,
-    ModifierOption,
 )
 from app.schemas.menu import CategoryWithItems
+from app.schemas.order import OrderDetail
 from app.core.socket import manager
 from app.core.ratelimit import RateLimiter
+from app.core.idempotency import idempotency, idempotent_replay
+from app.core.orders import PendingOrder, insert_order, price_cart
+from app.core.order_batcher import order_batcher
+from app.core.price_book import price_books
+from app.core.menu_cache import menu_cache, etag_matches
+from app.core.responses import FastJSONResponse, render_model
 from app.core.config import settings
+from app.core.tenant_cache import tenant_cache, CachedTenant
+from app.core.tenant_context import TenantContext, unresolved_tenant_error
 from app.api.v1.deps import get_current_user  # Need this to parse token safely
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Literal, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from uuid import UUID
-from jose import jwt, JWTError  # Need low-level decode for initial tenant resolution
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# GET /orders: KDS event sequence number the returned orders are current to
+KDS_SEQ_HEADER = "X-KDS-Seq"
 # --- Config Schemas ---
 
 
@@ -66,77 +85,53 @@ class OrderResponse(BaseModel):
     total_amount: int
 
 
-class OrderDetail(BaseModel):
-    id: UUID
-    ticket_number: int
-    customer_name: str
-    table_number: Optional[str] = None
-    status: str
-    total_amount: int
-    items: List[dict]
-    created_at: datetime
-
-    class Config:
-        from_attributes = True
-
-
 class OrderStatusUpdate(BaseModel):
     status: Literal["PENDING", "QUEUED", "PREPARING", "READY", "COMPLETED"]
 
 
 # --- UPDATED HELPER ---
-def resolve_tenant_context(request: Request, db: Session) -> Tenant:
+def _demo_session_tenant(host: str, target_schema: str) -> CachedTenant:
+    # We need to construct a Tenant object that points to the ephemeral schema
+    return CachedTenant(
+        id=None,
+        name="Demo Session",
+        domain=host,
+        schema_name=target_schema,
+        theme_config={},  # Config is fetched separately usually
+    )
+
+
+def resolve_tenant_context(request: Request) -> CachedTenant:
     """
     Determines the correct Tenant/Schema to use.
     Prioritizes Auth Token 'target_schema' for Demo isolation.
+    Reads the context TenantMiddleware resolved for this request.
     """
-    host = request.headers.get("host", "").split(":")[0]
-
-    # 1. Check for Authorization Header (Magic Token Override)
-    auth_header = request.headers.get("Authorization")
-    target_schema = None
-
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-        try:
-            # We decoded crudely here just to get the schema claim quickly
-            # Security verification happens in `get_current_user` dependency usually,
-            # but for tenant resolution strictly, this is acceptable if we fallback safely.
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            target_schema = payload.get("target_schema")
-        except JWTError:
-            pass  # Invalid token, fall back to host resolution
-
-    # 2. Logic for Demo Domain
-    if host == settings.DEMO_DOMAIN:
+    context: TenantContext = request.state.tenant
+
+    # 1. Logic for Demo Domain
+    if context.is_demo:
         # If we found a specific schema in the token, return a virtual tenant object
-        if target_schema:
-            # Ensure we are in public to read the base config, OR just use the ephemeral schema
-            # We need to construct a Tenant object that points to this schema
-            return Tenant(
-                name="Demo Session",
-                domain=host,
-                schema_name=target_schema,
-                theme_config={},  # Config is fetched separately usually
-            )
+        if context.target_schema:
+            return _demo_session_tenant(context.host, context.target_schema)
 
         # Fallback: The generic read-only demo tenant
-        db.execute(text("SET search_path TO public"))
-        tenant = (
-            db.query(Tenant).filter(Tenant.schema_name == settings.DEMO_SCHEMA).first()
-        )
-        if not tenant:
+        if not context.resolved:
+            raise unresolved_tenant_error()
+        if not context.tenant:
             # Should be seeded
             raise HTTPException(status_code=500, detail="Generic demo tenant missing.")
-        return tenant
-
-    # 3. Standard Logic (Subdomains/Custom Domains)
-    db.execute(text("SET search_path TO public"))
-    tenant = db.query(Tenant).filter(Tenant.domain == host).first()
-    if not tenant:
-        raise HTTPException(status_code=404, detail=f"No tenant found for: {host}")
+        return context.tenant
+
+    # 2. Standard Logic (Subdomains/Custom Domains)
+    if not context.resolved:
+        raise unresolved_tenant_error()
+    if not context.tenant:
+        raise HTTPException(
+            status_code=404, detail=f"No tenant found for: {context.host}"
+        )
 
-    return tenant
+    return context.tenant
 
 
 # --- Endpoints ---
@@ -148,24 +143,16 @@ def get_store_config(request: Request, db: Session = Depends(get_db)):
     # IF you created a row in sys.py (which we did), this works.
 
     # 1. Resolve Schema
-    tenant_context = resolve_tenant_context(request, db)
-
-    # 2. Fetch Config from Public Table
-    db.execute(text("SET search_path TO public"))
+    tenant_context = resolve_tenant_context(request)
 
-    # We query by schema_name because the 'id' might be virtual/unknown in the context object
-    real_tenant = (
-        db.query(Tenant)
-        .filter(Tenant.schema_name == tenant_context.schema_name)
-        .first()
-    )
+    # 2. Fetch Config from Public Table (cached)
+    # We look up by schema_name because the 'id' might be virtual/unknown in the context object
+    real_tenant = tenant_cache.get_by_schema(db, tenant_context.schema_name)
 
     # Fallback for generic demo if token schema not found (e.g. expired session)
     if not real_tenant and tenant_context.schema_name.startswith("demo_"):
         # Try fetching the generic demo config so the UI doesn't crash
-        real_tenant = (
-            db.query(Tenant).filter(Tenant.schema_name == settings.DEMO_SCHEMA).first()
-        )
+        real_tenant = tenant_cache.get_by_schema(db, settings.DEMO_SCHEMA)
 
     if not real_tenant:
         return TenantConfigResponse(name="Store Not Found", primary_color="#000")
@@ -177,7 +164,7 @@ def get_store_config(request: Request, db: Session = Depends(get_db)):
         {"label": "Sat - Sun", "time": "10:00 AM - 11:00 PM"},
     ]
 
-    return TenantConfigResponse(
+    config = TenantConfigResponse(
         name=real_tenant.name,
         primary_color=theme.get("primary_color", "#000000"),
         font_family=theme.get("font_family", "Inter"),
@@ -187,46 +174,125 @@ def get_store_config(request: Request, db: Session = Depends(get_db)):
         email=theme.get("email", "hello@example.com"),
         operating_hours=theme.get("operating_hours", default_hours),
     )
+    if settings.FAST_JSON_RESPONSES:
+        # Built from the tenant cache just above: no second validation pass
+        return FastJSONResponse(config.model_dump())
+    return config
+
+
+# Validates ORM rows against the response schema and renders them to JSON bytes
+menu_adapter = TypeAdapter(List[CategoryWithItems])
+orders_adapter = TypeAdapter(List[OrderDetail])
 
 
 @router.get("/menu", response_model=List[CategoryWithItems])
 def get_store_menu(request: Request, db: Session = Depends(get_db)):
-    tenant = resolve_tenant_context(request, db)
+    """
+    Storefront menu, served from the rendered-JSON cache.
+    Supports conditional requests (ETag / If-None-Match -> 304).
+    """
+    tenant = resolve_tenant_context(request)
 
-    # Switch to specific schema
-    db.execute(text(f"SET search_path TO {tenant.schema_name}, public"))
+    version = menu_cache.version(tenant.schema_name)
+    menu = menu_cache.get(tenant.schema_name, version)
 
-    categories = (
-        db.query(Category)
-        .options(
-            joinedload(Category.items)
-            .joinedload(MenuItem.modifier_groups)
-            .joinedload(ModifierGroup.options)
+    if menu is None:
+        # Switch to specific schema
+        bind_tenant(db, tenant.schema_name)
+
+        categories = (
+            db.query(Category)
+            .options(
+                joinedload(Category.items)
+                .joinedload(MenuItem.modifier_groups)
+                .joinedload(ModifierGroup.options)
+            )
+            .order_by(Category.rank.asc())
+            .all()
         )
-        .order_by(Category.rank.asc())
-        .all()
-    )
-    return categories
+        body = menu_adapter.dump_json(
+            menu_adapter.validate_python(categories, from_attributes=True)
+        )
+        menu = menu_cache.put(tenant.schema_name, version, body)
+
+    # Demo sessions share a host and differ only by token
+    headers = {"ETag": menu.etag, "Cache-Control": "no-cache", "Vary": "Authorization"}
+
+    if etag_matches(request.headers.get("if-none-match"), menu.etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=menu.body, media_type="application/json", headers=headers)
 
 
 # --- New KDS Endpoints ---
 
 
+async def kds_seq(request: Request) -> Optional[int]:
+    """
+    Current KDS event sequence number of the tenant, None when the event log
+    is unavailable. As a dependency it is read before the handler queries.
+    """
+    current, _ = await manager.replay(resolve_tenant_context(request).schema_name, None)
+    return current
+
+
 @router.get("/orders", response_model=List[OrderDetail])
-def get_active_orders(request: Request, db: Session = Depends(get_db)):
+def get_active_orders(
+    request: Request,
+    response: Response,
+    seq: Optional[int] = Depends(kds_seq),
+    db: Session = Depends(get_db),
+):
     """
     Fetch active orders for the KDS (Persistence).
+    The X-KDS-Seq header holds the event sequence number read before the
+    query: continue with GET /orders/changes?since=<seq>.
     """
-    tenant = resolve_tenant_context(request, db)
-    db.execute(text(f"SET search_path TO {tenant.schema_name}, public"))
+    tenant = resolve_tenant_context(request)
+    bind_tenant(db, tenant.schema_name)
 
-    orders = (
+    query = (
         db.query(Order)
-        .filter(Order.status.in_(["PENDING", "QUEUED", "PREPARING", "READY"]))
-        .order_by(Order.created_at.asc())
-        .all()
+        # Same predicate as the partial index ix_orders_active_created_at
+        .filter(Order.status != "COMPLETED")
     )
-    return orders
+    if settings.KDS_ACTIVE_ORDER_DAYS > 0:
+        # Opt-in bound on created_at: only the latest partitions are scanned
+        since = datetime.utcnow() - timedelta(days=settings.KDS_ACTIVE_ORDER_DAYS)
+        query = query.filter(Order.created_at >= since)
+    orders = query.order_by(Order.created_at.asc()).all()
+
+    result = orders
+    if settings.FAST_JSON_RESPONSES:
+        # Returned as is: the header goes on the rendered response itself
+        response = result = render_model(orders_adapter, orders)
+    if seq is not None:
+        response.headers[KDS_SEQ_HEADER] = str(seq)
+    return result
+
+
+@router.get("/orders/changes")
+async def get_order_changes(request: Request, since: int = Query(..., ge=0)):
+    """
+    KDS delta sync: the order events after sequence number `since`, from the
+    replay buffer (no DB access). 410 when they are no longer all buffered;
+    its body carries the current `seq`, but the events in between are lost:
+    refetch GET /orders and continue from its X-KDS-Seq header.
+    """
+    tenant = resolve_tenant_context(request)
+
+    current, missed = await manager.replay(tenant.schema_name, since)
+    if current is None:
+        raise HTTPException(status_code=503, detail="Event log unavailable")
+    if missed is None:
+        return FastJSONResponse(
+            status_code=410,
+            content={"detail": "Too far behind, refetch orders", "seq": current},
+        )
+
+    # Events are stored serialized: splice them in as-is
+    body = f'{{"seq":{current},"events":[{",".join(missed)}]}}'
+    return Response(content=body, media_type="application/json")
 
 
 @router.put("/orders/{order_id}/status", response_model=OrderResponse)
@@ -234,26 +300,28 @@ async def update_order_status(
     order_id: str,
     payload: OrderStatusUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update order status and sync via WebSocket.
     """
-    tenant = resolve_tenant_context(request, db)
+    tenant = resolve_tenant_context(request)
 
-    # 1. Initial Context Set
-    db.execute(text(f"SET search_path TO {tenant.schema_name}, public"))
+    # 1. Bind Context (re-applied automatically after commit)
+    await bind_tenant_async(db, tenant.schema_name)
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    try:
+        oid = UUID(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Order ID format")
+
+    result = await db.execute(select(Order).where(Order.id == oid))
+    order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     order.status = payload.status
-    db.commit()
-
-    # Re-apply schema context because commit() resets transaction state
-    db.execute(text(f"SET search_path TO {tenant.schema_name}, public"))
-    db.refresh(order)
+    await db.commit()
 
     # Broadcast using the SPECIFIC schema name
     await manager.broadcast_to_tenant(
@@ -277,135 +345,96 @@ async def update_order_status(
     "/orders",
     response_model=OrderResponse,
     status_code=201,
-    dependencies=[Depends(RateLimiter(times=20, seconds=600))],
+    dependencies=[
+        # First: replays skip the rate limiters
+        Depends(idempotency.check),
+        Depends(RateLimiter(times=20, seconds=600)),
+        Depends(
+            RateLimiter(
+                times=settings.ORDER_RATE_LIMIT_PER_TENANT,
+                seconds=60,
+                scope="tenant",
+                detail="This store is receiving too many orders. Please try again shortly.",
+            )
+        ),
+    ],
 )
-async def create_store_order(
-    payload: OrderCreateRequest, request: Request, db: Session = Depends(get_db)
-):
+async def create_store_order(payload: OrderCreateRequest, request: Request):
     """
     Creates an order with SERVER-SIDE price calculation and Daily Ticket #.
+    Prices come from the tenant's cached price book; the ticket number and
+    the order are written by a single INSERT ... RETURNING (batched with
+    other orders under ORDER_BATCHING).
+    Retries carrying the same Idempotency-Key get the first response back.
     """
-    # 1. Resolve Tenant (Crucial for Demo Isolation)
-    tenant = resolve_tenant_context(request, db)
-
-    # 2. Set Context
-    schema_context_sql = text(f"SET search_path TO {tenant.schema_name}, public")
-    db.execute(schema_context_sql)
-
-    # 3. Calculate Daily Ticket Number
-    today_start = datetime.utcnow().date()
-    last_order = (
-        db.query(Order.ticket_number)
-        .filter(func.date(Order.created_at) == today_start)
-        .order_by(Order.ticket_number.desc())
-        .first()
-    )
-    next_ticket_num = (last_order[0] + 1) if last_order else 1
-
-    # 4. Fetch Items & Modifiers (unchanged logic)
-    item_ids = [item.id for item in payload.items]
-    modifier_ids = [mod.optionId for item in payload.items for mod in item.modifiers]
+    replay = idempotent_replay(request)
+    if replay is None:
+        # Rate limits and body validation passed: hold the key from here on
+        replay = await idempotency.claim(request)
+    if replay is not None:
+        return OrderResponse(**replay)
 
-    db_items = db.query(MenuItem).filter(MenuItem.id.in_(item_ids)).all()
-    items_map = {item.id: item for item in db_items}
+    try:
+        response = await place_order(payload, request)
+    except Exception:
+        await idempotency.release(request)
+        raise
+    await idempotency.complete(request, response.model_dump())
+    return response
 
-    db_modifiers = (
-        db.query(ModifierOption).filter(ModifierOption.id.in_(modifier_ids)).all()
-    )
-    mods_map = {mod.id: mod for mod in db_modifiers}
-
-    grand_total = 0
-    items_snapshot = []
-
-    for item_in in payload.items:
-        db_item = items_map.get(item_in.id)
-        if not db_item:
-            continue
-
-        item_total_cents = db_item.price
-        modifiers_snapshot = []
-        for mod_in in item_in.modifiers:
-            db_mod = mods_map.get(mod_in.optionId)
-            if db_mod:
-                item_total_cents += db_mod.price_adjustment
-                modifiers_snapshot.append(
-                    {
-                        "id": str(db_mod.id),
-                        "name": db_mod.name,
-                        "price": db_mod.price_adjustment,
-                    }
-                )
 
-        line_total = item_total_cents * item_in.qty
-        grand_total += line_total
+async def place_order(payload: OrderCreateRequest, request: Request) -> OrderResponse:
+    # 1. Resolve Tenant (Crucial for Demo Isolation)
+    tenant = resolve_tenant_context(request)
 
-        items_snapshot.append(
-            {
-                "id": str(db_item.id),
-                "name": db_item.name,
-                "qty": item_in.qty,
-                "price_snapshot": db_item.price,
-                "modifiers": modifiers_snapshot,
-                "line_total": line_total,
-            }
-        )
+    # 2. Price the cart (the price book is only read on a menu change)
+    book = await price_books.get(tenant.schema_name)
+    cart = price_cart(book, payload.items)
 
-    if grand_total == 0 and not items_snapshot:
+    if cart.total_amount == 0 and not cart.items:
         raise HTTPException(status_code=400, detail="Order cannot be empty")
 
-    new_order = Order(
-        ticket_number=next_ticket_num,
-        customer_name=payload.customer_name,
-        table_number=payload.table_number,
-        total_amount=grand_total,
-        items=items_snapshot,
-        status="PENDING",
-    )
-
-    db.add(new_order)
-
+    # 3. Reserve Daily Ticket Number and insert, in one round trip over a
+    # schema-bound autocommit connection (no SET search_path)
     try:
-        db.commit()
-        db.execute(schema_context_sql)  # Re-apply context
-        db.refresh(new_order)
-
-        order_data = {
-            "id": str(new_order.id),
-            "ticket_number": new_order.ticket_number,
-            "customer_name": new_order.customer_name,
-            "table_number": new_order.table_number,
-            "total_amount": new_order.total_amount,
-            "items": new_order.items,
-            "status": new_order.status,
-            "created_at": str(new_order.created_at),
-        }
+        if settings.ORDER_BATCHING:
+            # Group commit; the batcher also broadcasts to the KDS
+            order_data = await order_batcher.submit(
+                tenant.schema_name,
+                PendingOrder(cart, payload.customer_name, payload.table_number),
+            )
+        else:
+            async with tenant_connection(tenant.schema_name) as conn:
+                order_data = await insert_order(
+                    conn, cart, payload.customer_name, payload.table_number
+                )
     except Exception as e:
-        db.rollback()
-        print(f"Order Placement Error: {e}")
+        logger.exception(f"Order placement failed for {tenant.schema_name}")
         raise HTTPException(status_code=500, detail=f"Failed to place order: {e}")
 
-    # 5. Broadcast to the ISOLATED schema channel
-    await manager.broadcast_to_tenant(
-        tenant.schema_name,
-        {
-            "event": "new_order",
-            "order": order_data,
-        },
-    )
+    # 4. Broadcast to the ISOLATED schema channel
+    if not settings.ORDER_BATCHING:
+        await manager.broadcast_to_tenant(
+            tenant.schema_name,
+            {
+                "event": "new_order",
+                "order": order_data,
+            },
+        )
 
     return OrderResponse(
-        id=str(new_order.id),
-        ticket_number=new_order.ticket_number,
-        status=new_order.status,
+        id=order_data["id"],
+        ticket_number=order_data["ticket_number"],
+        status=order_data["status"],
         message="Order placed successfully",
-        total_amount=new_order.total_amount,
+        total_amount=order_data["total_amount"],
     )
 
 
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 def get_order_status(order_id: str, request: Request, db: Session = Depends(get_db)):
-    tenant = resolve_tenant_context(request, db)
-    db.execute(text(f"SET search_path TO {tenant.schema_name}, public"))
+    tenant = resolve_tenant_context(request)
+    bind_tenant(db, tenant.schema_name)
 
     try:
         oid = UUID(order_id)
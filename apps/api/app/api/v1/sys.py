@@ -1,9 +1,10 @@
 import uuid
 import re
+import logging
 from fastapi import APIRouter, HTTPException, Depends, Body
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.db.session import get_db, engine
+from app.db.session import get_db, engine, bind_tenant
 from app.db.models import (
     Tenant,
     Lead,
@@ -18,7 +19,17 @@ from app.schemas.provision import (
 from app.api.v1.deps import get_current_user
 from app.core.config import settings
 from app.core.security import create_access_token
-from app.core.seed_internal import provision_tenant_internal, DEMO_TENANT_SEED
+from app.core.tenant_cache import tenant_cache
+from app.core.menu_cache import menu_cache
+from app.core.demo_pool import claim_demo_schema
+from app.core.demo_reaper import reaper_stats
+from app.core.seed_internal import (
+    provision_tenant_internal,
+    clone_demo_schema,
+    DEMO_TENANT_SEED,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -42,7 +53,7 @@ def provision_tenant(
     clean_name = re.sub(r"[^a-zA-Z0-9]", "", payload.name.lower())
     schema_name = f"tenant_{clean_name}"
 
-    db.execute(text("SET search_path TO public"))
+    bind_tenant(db, "public")
 
     existing = db.query(Tenant).filter(Tenant.domain == payload.domain).first()
     if existing:
@@ -66,6 +77,8 @@ def provision_tenant(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+    tenant_cache.invalidate(domain=payload.domain, schema=schema_name)
+
     try:
         db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
         db.commit()
@@ -120,7 +133,7 @@ def generate_demo_session(payload: dict = Body(...), db: Session = Depends(get_d
 
     # 2. Save Lead (Public Schema)
     try:
-        db.execute(text("SET search_path TO public"))
+        bind_tenant(db, "public")
         lead = Lead(name=name, email=email, assigned_schema=schema_name)
         db.add(lead)
         db.commit()
@@ -129,49 +142,66 @@ def generate_demo_session(payload: dict = Body(...), db: Session = Depends(get_d
         print(f"Lead Save Error: {e}")
         # Proceed anyway, don't block the demo if lead save fails (rare)
 
-    # 3. Create Schema & Seed
-    try:
-        # Create Schema
-        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
-        db.commit()
+    # Since our /settings endpoints read from 'public.tenants', we DO need a record there
+    # for this specific ephemeral schema, otherwise settings changes won't persist or be readable.
+    tenant_record = {
+        "name": f"{name}'s Bistro",
+        "domain": f"demo-{session_id}.local",  # Fake domain, not used for routing
+        "schema_name": schema_name,
+        "theme_config": DEMO_TENANT_SEED["theme_config"],
+    }
 
-        # Seed Data
-        # We reuse the High Fidelity Demo Seed, but override the schema name
-        session_seed = DEMO_TENANT_SEED.copy()
-        session_seed["schema_name"] = schema_name
+    # 3a. Fast path: claim a ready schema from the pool kept warm by the worker
+    cloned = False
+    if settings.DEMO_POOL_SIZE > 0:
+        try:
+            cloned = claim_demo_schema(engine, schema_name, tenant_record)
+        except Exception as e:
+            logger.warning(f"Demo pool claim failed for {schema_name}: {e}")
 
-        # Run provisioning (create tables + insert data)
-        # We pass a flag to skip creating the public Tenant record inside the seeder
-        # because ephemeral sessions don't need a persistent public record for routing.
-        provision_tenant_internal(db, session_seed, engine, skip_public_record=True)
+    # 3b. Copy the pre-seeded template schema in one transaction
+    if not cloned and settings.DEMO_CLONE_FROM_TEMPLATE:
+        try:
+            clone_demo_schema(engine, schema_name, tenant_record)
+            cloned = True
+        except Exception as e:
+            # Missing template or a failed copy: nothing was committed
+            logger.warning(f"Demo template clone failed for {schema_name}: {e}")
+
+    # 3c. Fallback: Create Schema & Seed
+    if not cloned:
+        try:
+            # Create Schema
+            db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
+            db.commit()
 
-        # Create a "fake" tenant config in the session so settings endpoints work.
-        # Since our /settings endpoints read from 'public.tenants', we DO need a record there
-        # for this specific ephemeral schema, otherwise settings changes won't persist or be readable.
-        # We insert a dummy Tenant record into the PUBLIC table for this ephemeral schema.
-
-        db.execute(text("SET search_path TO public"))
-        ephemeral_tenant = Tenant(
-            name=f"{name}'s Bistro",
-            domain=f"demo-{session_id}.local",  # Fake domain, not used for routing
-            schema_name=schema_name,
-            theme_config=DEMO_TENANT_SEED["theme_config"],
-        )
-        db.add(ephemeral_tenant)
-        db.commit()
+            # Seed Data
+            # We reuse the High Fidelity Demo Seed, but override the schema name
+            session_seed = DEMO_TENANT_SEED.copy()
+            session_seed["schema_name"] = schema_name
 
-    except Exception as e:
-        print(f"Provisioning Error: {e}")
-        # Clean up if possible
-        try:
-            db.execute(text(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE"))
+            # Run provisioning (create tables + insert data)
+            # We pass a flag to skip creating the public Tenant record inside the seeder
+            # because ephemeral sessions don't need a persistent public record for routing.
+            provision_tenant_internal(db, session_seed, engine, skip_public_record=True)
+
+            # We insert a dummy Tenant record into the PUBLIC table for this ephemeral schema.
+            bind_tenant(db, "public")
+            db.add(Tenant(**tenant_record))
             db.commit()
-        except:
-            pass
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to prepare your environment. Please try again.",
-        )
+
+        except Exception as e:
+            print(f"Provisioning Error: {e}")
+            # Clean up if possible
+            try:
+                db.execute(text(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE"))
+                db.commit()
+            except:
+                pass
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to prepare your environment. Please try again.",
+            )
 
     # 4. Generate Token with Custom Claim
     # This 'target_schema' claim tells deps.py to switch to this schema
@@ -207,10 +237,11 @@ def reset_demo_data(
 
     # 1. Wipe Data (Orders AND Menu)
     try:
-        db.execute(text(f"SET search_path TO {schema}"))
+        bind_tenant(db, schema)
 
-        # Truncate orders
+        # Truncate orders (and restart today's ticket numbering)
         db.execute(text("TRUNCATE TABLE orders CASCADE"))
+        db.execute(text("TRUNCATE TABLE ticket_counters"))
 
         # Truncate categories (CASCADE will wipe items, modifier groups, and options)
         db.execute(text("TRUNCATE TABLE categories CASCADE"))
@@ -222,11 +253,12 @@ def reset_demo_data(
 
     # 2. Reset Branding (Public Tenant Record)
     try:
-        db.execute(text("SET search_path TO public"))
+        bind_tenant(db, "public")
         tenant = db.query(Tenant).filter(Tenant.schema_name == schema).first()
         if tenant:
             tenant.theme_config = DEMO_TENANT_SEED["theme_config"]
             db.commit()
+        tenant_cache.invalidate(schema=schema)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to reset theme: {e}")
@@ -242,6 +274,7 @@ def reset_demo_data(
         # and if data exists (it doesn't, because we just truncated).
         # We skip public record creation because we already reset the existing record in step 2.
         provision_tenant_internal(db, session_seed, engine, skip_public_record=True)
+        menu_cache.bump(schema)
 
     except Exception as e:
         # Don't rollback the truncates if re-seeding fails, otherwise we are in a weird state
@@ -253,6 +286,22 @@ def reset_demo_data(
     return {"message": "Environment reset successfully."}
 
 
+@router.get("/demo-reaper")
+def get_demo_reaper_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Totals of what the worker's demo reaper has reclaimed so far.
+    Protected: Only accessible by Super Admins via the Admin Portal.
+    """
+    if not current_user.get("is_superuser"):
+        if current_user.get("email") not in settings.SUPER_ADMINS:
+            raise HTTPException(status_code=403, detail="Super Admins only.")
+
+    try:
+        return reaper_stats()
+    except Exception:
+        raise HTTPException(status_code=503, detail="Stats unavailable")
+
+
 @router.post("/contact")
 def submit_contact_form(payload: ContactFormRequest, db: Session = Depends(get_db)):
     """
@@ -260,7 +309,7 @@ def submit_contact_form(payload: ContactFormRequest, db: Session = Depends(get_d
     """
     try:
         # Ensure we write to public schema
-        db.execute(text("SET search_path TO public"))
+        bind_tenant(db, "public")
 
         new_request = ContactRequest(
             name=payload.name, email=payload.email, business_name=payload.business_name
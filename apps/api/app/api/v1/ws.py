@@ -1,11 +1,8 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.db.models import Tenant
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from app.core.socket import manager
-from app.core.config import settings
-from jose import jwt, JWTError
+from app.core.tenant_context import TenantContext
 import logging
+from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
@@ -15,17 +12,18 @@ logger = logging.getLogger("uvicorn")
 async def websocket_endpoint(
     websocket: WebSocket,
     token: str = Query(None),  # <--- Accept Token via Query Param
-    db: Session = Depends(get_db),
+    since: Optional[int] = Query(None),  # Last event seq seen, for replay
 ):
     """
     KDS WebSocket Endpoint with Isolation Logic.
     """
-    # 1. Resolve Tenant / Schema
-    host = websocket.headers.get("host", "").split(":")[0]
+    # 1. Resolve Tenant / Schema (resolved by TenantMiddleware from ?token=)
+    context: TenantContext = websocket.state.tenant
+    host = context.host
     schema_name = None
 
     # --- CASE A: DEMO ENVIRONMENT ---
-    if host == settings.DEMO_DOMAIN:
+    if context.is_demo:
         # We MUST have a token to separate users in the demo environment
         if not token:
             logger.warning(
@@ -34,37 +32,32 @@ async def websocket_endpoint(
             await websocket.close(code=4003, reason="Authentication required")
             return
 
-        try:
-            # Decode the Magic Token (HS256)
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-
-            # Extract the unique ephemeral schema (e.g. "demo_8f3a...")
-            target_schema = payload.get("target_schema")
-
-            if not target_schema:
-                # Fallback to generic demo if claim is missing (shouldn't happen with valid tokens)
-                schema_name = settings.DEMO_SCHEMA
-            else:
-                schema_name = target_schema
-
-        except JWTError:
+        if context.claims is None:
             logger.warning(f"WS Connection rejected: Invalid Token")
             await websocket.close(code=4003, reason="Invalid Token")
             return
 
+        # The unique ephemeral schema (e.g. "demo_8f3a..."), or the generic
+        # demo if the claim is missing (shouldn't happen with valid tokens)
+        schema_name = context.schema_name
+
     # --- CASE B: STANDARD TENANT (Subdomain/Custom Domain) ---
     else:
-        tenant = db.query(Tenant).filter(Tenant.domain == host).first()
-        if not tenant:
+        if not context.resolved:
+            # Lookup failed (database down): the screen reconnects later
+            await websocket.close(code=1013, reason="Try again later")
+            return
+        if not context.tenant:
             logger.warning(f"WS Connection rejected: Unknown Host {host}")
             await websocket.close(code=4000, reason="Tenant not found")
             return
-        schema_name = tenant.schema_name
+        schema_name = context.tenant.schema_name
 
     # 2. Connect
     # The ConnectionManager will now use the unique 'demo_xyz' schema as the key,
     # ensuring User A's order updates don't broadcast to User B.
-    await manager.connect(schema_name, websocket)
+    if not await manager.connect(schema_name, websocket, since):
+        return  # Closed with 1013: the screen reconnects
     logger.info(f"KDS Connected: {schema_name} [{host}]")
 
     try:
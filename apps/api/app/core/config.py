@@ -12,10 +12,20 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "stelly"
     POSTGRES_PORT: str = "5432"
 
+    # Connection Pool (per process)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
+    # Tenant Migrations (`python -m app.worker migrate`)
+    TENANT_MIGRATION_WORKERS: int = 4
+
     # Security - Local (Self-Contained Demo)
     SECRET_KEY: str = "538422cb-34b7-48a8-8fcc-8c28b6bc21d3"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     ALGORITHM: str = "HS256"
+    # Verified token claims kept in memory (per process) until they expire
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096
 
     # Super Admins (Simple email check for demo purposes)
     SUPER_ADMINS: List[str] = ["admin@stelly.localhost"]
@@ -23,6 +33,17 @@ class Settings(BaseSettings):
     # Demo Mode Configuration
     DEMO_DOMAIN: str = "demo.stelly.localhost"
     DEMO_SCHEMA: str = "tenant_demo"
+    # Clone demo sessions from a pre-seeded template schema (set-based SQL, one
+    # transaction) instead of provisioning and seeding each one from scratch
+    DEMO_CLONE_FROM_TEMPLATE: bool = True
+    DEMO_TEMPLATE_SCHEMA: str = "template_demo"
+    # Ready-made demo schemas kept warm by the worker (0 disables the pool)
+    DEMO_POOL_SIZE: int = 10
+    DEMO_POOL_REFILL_INTERVAL_SECONDS: int = 5
+    # Expired demo schemas (older than the token lifetime) dropped by the worker
+    DEMO_REAPER_INTERVAL_SECONDS: int = 300
+    DEMO_REAPER_BATCH_SIZE: int = 50
+    DEMO_REAPER_PAUSE_SECONDS: float = 0.5
 
     # Storage (MinIO/S3)
     S3_ENDPOINT: str = "http://minio:9000"
@@ -36,10 +57,88 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
 
+    # KDS Broadcast Backend: "memory" (single process) or "redis" (pub/sub fan-out
+    # across workers and replicas)
+    BROADCAST_BACKEND: str = "memory"
+    # Per-screen outbox: screens that fall this far behind, or take longer than
+    # the timeout to accept a message, are disconnected
+    KDS_SEND_QUEUE_SIZE: int = 100
+    KDS_SEND_TIMEOUT_SECONDS: float = 5.0
+    # Recent events kept per tenant so reconnecting screens only get what they
+    # missed (?since=<seq>); larger gaps fall back to a full REST refetch
+    KDS_REPLAY_BUFFER_SIZE: int = 200
+    KDS_REPLAY_TTL_SECONDS: int = 3600
+
+    # Tenant Resolution Cache (per process)
+    TENANT_CACHE_TTL_SECONDS: int = 60
+    TENANT_CACHE_MAX_ENTRIES: int = 1024
+
+    # Rate limiting: share of each limit a process may admit from its local
+    # token buckets before checking Redis (0 = always Redis, exact). Locally
+    # admitted hits are recorded in Redis every RATE_LIMIT_FLUSH_SECONDS.
+    RATE_LIMIT_LOCAL_FRACTION: float = 0.5
+    RATE_LIMIT_FLUSH_SECONDS: float = 5.0
+    RATE_LIMIT_MAX_KEYS: int = 10000
+    RATE_LIMIT_IDLE_SECONDS: int = 600
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.25
+    # After a failed Redis call, limit locally for this long before retrying
+    RATE_LIMIT_REDIS_RETRY_SECONDS: float = 2.0
+
+    # Storefront order rate limit per tenant (orders per minute), on top of
+    # the per-IP limit
+    ORDER_RATE_LIMIT_PER_TENANT: int = 300
+
+    # Group commit for storefront orders: queue priced orders per tenant and
+    # insert them in micro-batches (one multi-row INSERT, one commit). A batch
+    # is flushed when full or ORDER_BATCH_MAX_WAIT_MS after its first order.
+    ORDER_BATCHING: bool = False
+    ORDER_BATCH_MAX_SIZE: int = 50
+    ORDER_BATCH_MAX_WAIT_MS: int = 10
+
+    # Idempotency-Key on order placement: completed responses are kept this
+    # long for retries; a key whose first request is still running is held
+    # for at most IDEMPOTENCY_LOCK_SECONDS
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+
+    # Serialize hot storefront endpoints (config, KDS orders) straight to JSON
+    # bytes, skipping FastAPI's response_model pass. Benchmark:
+    # `python -m app.core.responses`
+    FAST_JSON_RESPONSES: bool = False
+
+    # Rows fetched per query while streaming an order history export
+    ORDER_EXPORT_BATCH_SIZE: int = 500
+
+    # Tenant orders tables are partitioned by month (core.partitions). The
+    # worker creates partitions ORDERS_PARTITION_MONTHS_AHEAD months ahead and
+    # moves partitions older than ORDERS_ARCHIVE_AFTER_MONTHS (0 = never) to
+    # the archive schema.
+    ORDERS_PARTITION_MONTHS_AHEAD: int = 2
+    ORDERS_ARCHIVE_AFTER_MONTHS: int = 12
+    ORDERS_ARCHIVE_SCHEMA: str = "orders_archive"
+    ORDERS_PARTITION_INTERVAL_SECONDS: int = 3600
+    # Optional cutoff for the KDS board (0 = all open orders): when set, open
+    # orders older than this many days are left off and only the latest
+    # partitions are scanned
+    KDS_ACTIVE_ORDER_DAYS: int = 0
+
+    # Storefront Menu Cache (per process, versioned through Redis)
+    MENU_CACHE_TTL_SECONDS: int = 300
+    MENU_CACHE_MAX_ENTRIES: int = 256
+    # Menu version lookups give up (and skip the cache) after this long
+    MENU_VERSION_TIMEOUT_SECONDS: float = 0.25
+    # Order pricing data (per process, versioned with the menu)
+    PRICE_BOOK_TTL_SECONDS: int = 300
+    PRICE_BOOK_MAX_ENTRIES: int = 256
+
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
     class Config:
         case_sensitive = True
 
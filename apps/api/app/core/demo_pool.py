@@ -0,0 +1,87 @@
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, select, text
+
+from app.core.config import settings
+from app.core.seed_internal import copy_demo_template
+from app.db.models import DemoPoolSchema, Tenant
+
+logger = logging.getLogger(__name__)
+
+# Pooled schemas are renamed to demo_<session> when claimed, so the prefix
+# must not collide with the session prefix.
+POOL_PREFIX = "demopool_"
+
+_CLAIM = text(
+    """
+    DELETE FROM public.demo_pool
+    WHERE schema_name = (
+        SELECT schema_name FROM public.demo_pool
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING schema_name
+    """
+)
+
+
+def claim_demo_schema(engine, schema: str, tenant_record: dict) -> bool:
+    """
+    Takes a ready schema from the pool, renames it to `schema` and registers
+    its tenant row, all in one transaction.
+    Returns False when the pool is empty; the caller provisions the schema itself.
+    """
+    with engine.begin() as connection:
+        # SKIP LOCKED: concurrent signups each get a different schema
+        pooled = connection.execute(_CLAIM).scalar()
+        if pooled is None:
+            return False
+        connection.execute(text(f"ALTER SCHEMA {pooled} RENAME TO {schema}"))
+        connection.execute(Tenant.__table__.insert().values(**tenant_record))
+    logger.info(f"Demo schema {pooled} claimed as {schema}")
+    return True
+
+
+def pool_size(engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count()).select_from(DemoPoolSchema)
+        ).scalar()
+
+
+def add_pool_schema(engine) -> str:
+    """
+    Clones the demo template into a new pooled schema. The schema only
+    becomes claimable once its pool row commits together with it.
+    """
+    schema = f"{POOL_PREFIX}{uuid.uuid4().hex[:12]}"
+    with engine.begin() as connection:
+        copy_demo_template(connection, schema)
+        connection.execute(DemoPoolSchema.__table__.insert().values(schema_name=schema))
+    return schema
+
+
+def refill_demo_pool(engine, target: Optional[int] = None) -> int:
+    """
+    Tops the pool up to `target` schemas (defaults to DEMO_POOL_SIZE).
+    Returns how many schemas were added.
+    """
+    target = settings.DEMO_POOL_SIZE if target is None else target
+    missing = target - pool_size(engine)
+
+    added = 0
+    for _ in range(max(missing, 0)):
+        try:
+            add_pool_schema(engine)
+        except Exception as e:
+            # Usually a missing template; retried on the next refill
+            logger.error(f"Demo pool refill failed: {e}")
+            break
+        added += 1
+
+    if added:
+        logger.info(f"Demo pool refilled with {added} schema(s)")
+    return added
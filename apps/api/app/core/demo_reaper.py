@@ -0,0 +1,112 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from redis.exceptions import RedisError
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis hash with the running totals of the reaper
+STATS_KEY = "demo_reaper:stats"
+
+# A demo schema is expired once its tenant row (written when the session
+# created or claimed the schema) is older than the token lifetime: no token
+# can still point at it. Leads are optional (a session goes ahead without
+# one) and only keep a schema while they are newer.
+_EXPIRED_SCHEMAS = text(
+    r"""
+    SELECT n.nspname
+    FROM pg_namespace n
+    JOIN public.tenants t ON t.schema_name = n.nspname
+    LEFT JOIN public.leads l ON l.assigned_schema = n.nspname
+    WHERE n.nspname LIKE 'demo\_%'
+    GROUP BY n.nspname, t.created_at
+    HAVING greatest(t.created_at, max(l.created_at)) < :cutoff
+    ORDER BY t.created_at
+    LIMIT :limit
+    """
+)
+
+
+@dataclass
+class ReapResult:
+    schemas_dropped: int = 0
+    tenants_deleted: int = 0
+    failures: int = 0
+
+
+def find_expired_schemas(engine, limit: int) -> List[str]:
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    with engine.connect() as connection:
+        rows = connection.execute(_EXPIRED_SCHEMAS, {"cutoff": cutoff, "limit": limit})
+        return [row[0] for row in rows]
+
+
+def drop_demo_schema(engine, schema: str) -> int:
+    """
+    Drops one demo schema and its public tenant row in a single transaction.
+    Leads are kept. Returns the number of tenant rows deleted.
+    """
+    with engine.begin() as connection:
+        # Give up instead of queueing behind a request still using the schema
+        connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        deleted = connection.execute(
+            text("DELETE FROM public.tenants WHERE schema_name = :schema"),
+            {"schema": schema},
+        ).rowcount
+
+    try:
+        redis_client.delete(
+            f"menu:version:{schema}", f"kds:seq:{schema}", f"kds:log:{schema}"
+        )
+    except RedisError:
+        pass
+    return deleted
+
+
+def reap_expired_demos(engine) -> ReapResult:
+    """
+    Drops up to DEMO_REAPER_BATCH_SIZE expired demo schemas, pausing between
+    drops so catalog locks are released regularly.
+    """
+    result = ReapResult()
+    for schema in find_expired_schemas(engine, settings.DEMO_REAPER_BATCH_SIZE):
+        try:
+            result.tenants_deleted += drop_demo_schema(engine, schema)
+            result.schemas_dropped += 1
+        except Exception as e:
+            # Retried on the next run
+            logger.error(f"Failed to reap demo schema {schema}: {e}")
+            result.failures += 1
+        time.sleep(settings.DEMO_REAPER_PAUSE_SECONDS)
+
+    if result.schemas_dropped or result.failures:
+        logger.info(
+            f"Demo reaper: dropped {result.schemas_dropped} schema(s), "
+            f"deleted {result.tenants_deleted} tenant row(s), {result.failures} failure(s)"
+        )
+    record_stats(result)
+    return result
+
+
+def record_stats(result: ReapResult):
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(STATS_KEY, "schemas_dropped", result.schemas_dropped)
+        pipe.hincrby(STATS_KEY, "tenants_deleted", result.tenants_deleted)
+        pipe.hincrby(STATS_KEY, "failures", result.failures)
+        pipe.hset(STATS_KEY, "last_run", datetime.utcnow().isoformat())
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Demo reaper stats not recorded: {e}")
+
+
+def reaper_stats() -> dict:
+    return redis_client.hgetall(STATS_KEY)
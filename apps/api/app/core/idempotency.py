@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """
+    Replays completed responses for retried requests (`Idempotency-Key`
+    header), per tenant schema, from Redis.
+    A key is claimed by the first request that gets past rate limiting and
+    validation, and stores that request's response once it completes.
+    Retries with the same body get the stored response back
+    (`request.state.idempotent_replay`), before rate limiting and without
+    touching the database. Redis outages disable replays instead of
+    failing requests.
+    """
+
+    def __init__(self, ttl: int, lock_ttl: int, prefix: str = "idempotency:"):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.prefix = prefix
+
+    async def check(
+        self,
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, max_length=255),
+    ):
+        """
+        Route dependency; list it BEFORE the rate limiters so replays don't
+        count against them. Only looks the key up: new keys are claimed by
+        the handler (`claim()`), once rate limiting and body validation have
+        passed, so a rejected request never holds its key.
+        """
+        context = request.state.tenant
+        if not idempotency_key or not context.schema_name:
+            return
+
+        key = f"{self.prefix}{context.schema_name}:{idempotency_key}"
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        try:
+            stored = await async_redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Idempotency lookup failed for {key}: {e}")
+            return
+
+        if stored is None:
+            request.state.idempotency_key = (key, fingerprint)
+            return
+        request.state.idempotent_replay = self._replay(stored, fingerprint)
+
+    async def claim(self, request: Request) -> Optional[dict]:
+        """
+        Claims the request's new key for IDEMPOTENCY_LOCK_SECONDS. Returns the
+        stored response instead when a concurrent request completed it first.
+        """
+        pending = getattr(request.state, "idempotency_key", None)
+        if pending is None:
+            return None
+        key, fingerprint = pending
+        try:
+            claimed = await async_redis_client.set(
+                key, json.dumps({"fingerprint": fingerprint}), nx=True, ex=self.lock_ttl
+            )
+            stored = None if claimed else await async_redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Idempotency claim failed for {key}: {e}")
+            return None
+
+        if claimed:
+            request.state.idempotency = pending
+            return None
+        if stored is None:
+            # Released or expired meanwhile: go ahead without replay protection
+            return None
+        return self._replay(stored, fingerprint)
+
+    def _replay(self, stored: str, fingerprint: str) -> dict:
+        record = json.loads(stored)
+        if record.get("fingerprint") != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        if record.get("response") is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        return record["response"]
+
+    async def complete(self, request: Request, response: dict):
+        """Stores the response for retries of the claimed key, if any."""
+        claim = getattr(request.state, "idempotency", None)
+        if claim is None:
+            return
+        key, fingerprint = claim
+        record = json.dumps({"fingerprint": fingerprint, "response": response})
+        try:
+            await async_redis_client.set(key, record, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Idempotent response not stored for {key}: {e}")
+
+    async def release(self, request: Request):
+        """Frees the claimed key after a failure, so the client can retry."""
+        claim = getattr(request.state, "idempotency", None)
+        if claim is None:
+            return
+        try:
+            await async_redis_client.delete(claim[0])
+        except RedisError as e:
+            logger.warning(f"Idempotency key not released for {claim[0]}: {e}")
+
+
+def idempotent_replay(request: Request) -> Optional[dict]:
+    """Stored response for a retried request, None otherwise."""
+    return getattr(request.state, "idempotent_replay", None)
+
+
+# Global Instance
+idempotency = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS, lock_ttl=settings.IDEMPOTENCY_LOCK_SECONDS
+)
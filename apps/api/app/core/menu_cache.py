@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedMenu:
+    version: str
+    etag: str
+    body: bytes
+    expires_at: float
+
+
+class MenuCache:
+    """
+    Rendered storefront menu JSON per tenant schema.
+
+    Every schema has a version counter in Redis that admin menu writes bump,
+    so all API processes drop their copy on the next read. Entries also expire
+    after `ttl_seconds` in case a bump was lost while Redis was down.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedMenu]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version_key(self, schema_name: str) -> str:
+        return f"menu:version:{schema_name}"
+
+    def version(self, schema_name: str) -> Optional[str]:
+        """Current menu version, or None when it cannot be determined."""
+        try:
+            return redis_client.get(self._version_key(schema_name)) or "0"
+        except RedisError as e:
+            logger.warning(f"Menu version lookup failed for {schema_name}: {e}")
+            return None
+
+    async def version_async(self, schema_name: str) -> Optional[str]:
+        """
+        `version()` for handlers on the event loop. Bounded by
+        MENU_VERSION_TIMEOUT_SECONDS: an unreachable Redis must not stall
+        order placement.
+        """
+        try:
+            version = await asyncio.wait_for(
+                async_redis_client.get(self._version_key(schema_name)),
+                settings.MENU_VERSION_TIMEOUT_SECONDS,
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Menu version lookup failed for {schema_name}: {e!r}")
+            return None
+        return version or "0"
+
+    def bump(self, schema_name: str):
+        """
+        Marks the schema's menu as changed on every process. Also retires the
+        order price books (see price_book.PriceBookCache).
+        """
+        with self._lock:
+            self._entries.pop(schema_name, None)
+        try:
+            redis_client.incr(self._version_key(schema_name))
+        except RedisError as e:
+            logger.error(f"Menu version bump failed for {schema_name}: {e}")
+
+    def get(self, schema_name: str, version: Optional[str]) -> Optional[CachedMenu]:
+        if version is None:
+            return None
+        with self._lock:
+            menu = self._entries.get(schema_name)
+            if not menu:
+                return None
+            if menu.version != version or menu.expires_at < time.monotonic():
+                del self._entries[schema_name]
+                return None
+            self._entries.move_to_end(schema_name)
+            return menu
+
+    def put(self, schema_name: str, version: Optional[str], body: bytes) -> CachedMenu:
+        menu = CachedMenu(
+            version=version,
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+            body=body,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        if version is None:
+            # Unknown version: serve it, but don't keep it
+            return menu
+        with self._lock:
+            self._entries[schema_name] = menu
+            self._entries.move_to_end(schema_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return menu
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# Global Instance
+menu_cache = MenuCache(
+    ttl_seconds=settings.MENU_CACHE_TTL_SECONDS,
+    max_entries=settings.MENU_CACHE_MAX_ENTRIES,
+)
@@ -1,32 +1,55 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
 import logging
+from urllib.parse import parse_qs
 
-logger = logging.getLogger("uvicorn")
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.core.tenant_context import TenantContext, build_tenant_context
 
-class TenantMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        """
-        Phase 1 Logic:
-        1. Intercept request.
-        2. Extract Host header.
-        3. Print/Log for verification.
-        4. (Phase 2) Resolve Tenant and SET search_path.
-        """
+logger = logging.getLogger("uvicorn")
 
-        # 1. Read Host Header
-        host = request.headers.get("host", "unknown")
 
-        # Remove port number if present (e.g., localhost:8000 -> localhost)
-        domain = host.split(":")[0]
+class TenantMiddleware:
+    """
+    Pure ASGI middleware (no task hop or body buffering, unlike
+    BaseHTTPMiddleware) covering HTTP requests and WebSockets:
+    1. Extract Host header and token.
+    2. Resolve the tenant once (cached) and attach an immutable TenantContext
+       to `request.state.tenant` / `websocket.state.tenant`.
+    CORS preflights skip the lookup, and a failed lookup attaches an
+    unresolved context instead of failing the request: routes that don't
+    need a tenant keep working, the others answer 503.
+    Schemas are bound per session by the handlers (see db.session.bind_tenant).
+    """
 
-        # 2. Log for Phase 1 Validation
-        logger.info(f"Checking Tenant Resolution for Host: {domain}")
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        # 3. (Future) Database Lookup would happen here
-        # tenant = db.query(Tenant).filter(domain=domain).first()
-        # db.execute(f"SET search_path TO {tenant.schema_name}")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
 
-        response = await call_next(request)
-        return response
+        headers = Headers(scope=scope)
+
+        # Remove port number if present (e.g., localhost:8000 -> localhost)
+        domain = headers.get("host", "unknown").split(":")[0]
+        logger.debug("Checking Tenant Resolution for Host: %s", domain)
+
+        token = None
+        # Same parsing as OAuth2PasswordBearer: the scheme is case-insensitive
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            token = credentials
+        elif scope["type"] == "websocket":
+            # Browsers can't set headers on WebSockets: KDS passes ?token=
+            token = parse_qs(scope["query_string"].decode()).get("token", [None])[0]
+
+        if scope.get("method") == "OPTIONS":
+            context = TenantContext(host=domain, resolved=False)
+        else:
+            context = await build_tenant_context(domain, token)
+
+        # Backs request.state / websocket.state
+        scope.setdefault("state", {})["tenant"] = context
+        await self.app(scope, receive, send)
@@ -0,0 +1,162 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.seed_internal import tenant_ddl_fingerprint
+from app.db.models import TenantMigration
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def _table_exists(connection, name: str) -> bool:
+    found = connection.execute(text("SELECT to_regclass(:name)"), {"name": name})
+    return found.scalar() is not None
+
+
+def list_tenant_schemas(connection) -> List[str]:
+    """
+    Every schema that must follow the tenant models: registered tenants,
+    the demo template and unclaimed demo pool schemas.
+    """
+    schemas = []
+    if _table_exists(connection, "public.tenants"):
+        result = connection.execute(text("SELECT schema_name FROM public.tenants"))
+        schemas += result.scalars()
+
+    # The demo template has no tenant record but must track the models,
+    # otherwise clones copy rows into tables it doesn't match
+    template_exists = connection.execute(
+        text("SELECT 1 FROM information_schema.schemata WHERE schema_name = :s"),
+        {"s": settings.DEMO_TEMPLATE_SCHEMA},
+    ).scalar()
+    if template_exists:
+        schemas.append(settings.DEMO_TEMPLATE_SCHEMA)
+
+    # Same for unclaimed schemas in the demo pool
+    if _table_exists(connection, "public.demo_pool"):
+        result = connection.execute(text("SELECT schema_name FROM public.demo_pool"))
+        schemas += result.scalars()
+    return schemas
+
+
+def alembic_config(**attributes) -> Config:
+    """
+    Alembic config for programmatic runs. `attributes` are read by env.py:
+    `tenant_schema` migrates that schema only, `skip_tenants` only the public one.
+    """
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    cfg.set_main_option("sqlalchemy.url", settings.SQLALCHEMY_DATABASE_URI)
+    cfg.attributes.update(attributes)
+    return cfg
+
+
+def migrate_schema(schema: str, revision: str) -> Optional[str]:
+    """
+    Upgrades a single tenant schema. Runs in a pool process.
+    Returns the error message on failure.
+    """
+    try:
+        command.upgrade(alembic_config(tenant_schema=schema), revision)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def _record(
+    engine, schema: str, target: str, status: str, error: Optional[str] = None
+):
+    stmt = insert(TenantMigration).values(
+        schema_name=schema,
+        revision=target,
+        status=status,
+        error=error,
+        updated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TenantMigration.schema_name],
+        set_={
+            "revision": stmt.excluded.revision,
+            "status": stmt.excluded.status,
+            "error": stmt.excluded.error,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    with engine.begin() as connection:
+        connection.execute(stmt)
+
+
+def run_tenant_migrations(
+    engine, revision: str = "head", workers: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    Upgrades the public schema, then every tenant schema in parallel.
+
+    Progress is kept per schema in `public.tenant_migrations`, so a rerun skips
+    the schemas already at the target revision and retries the failed ones.
+    One failing schema doesn't stop the others.
+    Returns {schema: error} for the schemas that failed.
+    """
+    workers = workers or settings.TENANT_MIGRATION_WORKERS
+
+    # 1. Public schema, in-process
+    command.upgrade(alembic_config(skip_tenants=True), revision)
+
+    # Tenant tables are also backfilled from the models, so a model change
+    # must count as a new target even without a new revision
+    scripts = ScriptDirectory.from_config(alembic_config())
+    head = (scripts.get_current_head() or "base") if revision == "head" else revision
+    target = f"{head}:{tenant_ddl_fingerprint()}"
+
+    # 2. Tenant schemas still behind the target
+    TenantMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        done = set(
+            connection.execute(
+                select(TenantMigration.schema_name).where(
+                    TenantMigration.revision == target,
+                    TenantMigration.status == "done",
+                )
+            ).scalars()
+        )
+        pending = [s for s in list_tenant_schemas(connection) if s not in done]
+
+    logger.info(
+        f"Migrating {len(pending)} tenant schema(s) to {target} "
+        f"({len(done)} already done, {workers} workers)"
+    )
+
+    failures: Dict[str, str] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(migrate_schema, schema, revision): schema for schema in pending
+        }
+        for future in as_completed(futures):
+            schema = futures[future]
+            try:
+                error = future.result()
+            except Exception as e:
+                # Worker process died
+                error = f"{type(e).__name__}: {e}"
+
+            if error:
+                failures[schema] = error
+                logger.error(f"Migration failed for {schema}: {error}")
+                _record(engine, schema, target, "failed", error)
+            else:
+                _record(engine, schema, target, "done")
+
+    ok = len(pending) - len(failures)
+    logger.info(f"Tenant migrations finished: {ok} ok, {len(failures)} failed")
+    return failures
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Dict, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.orders import PendingOrder, insert_orders
+from app.core.socket import manager
+from app.db.session import tenant_connection
+
+logger = logging.getLogger(__name__)
+
+# An order waiting in a batch, and the caller awaiting its result
+Entry = Tuple[PendingOrder, asyncio.Future]
+
+
+class OrderBatcher:
+    """
+    Group commit for order placement (ORDER_BATCHING).
+    Priced orders are queued per tenant schema and written in micro-batches:
+    one multi-row INSERT (and its ticket reservation) and one commit per
+    batch, so throughput grows with batch size instead of the fsync rate.
+    A batch is flushed once it holds `max_size` orders or `max_wait` seconds
+    after its first order, whichever comes first. Each caller gets its own
+    order back (ticket number included); KDS events go out once the batch is
+    committed.
+    """
+
+    def __init__(self, max_size: int, max_wait: float):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._batches: Dict[str, List[Entry]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # Strong references to in-flight flushes
+        self._flushing: Set[asyncio.Task] = set()
+
+    async def submit(self, schema_name: str, order: PendingOrder) -> dict:
+        """Queues an order and waits for its batch to be committed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # The shield drops its callback once the caller is cancelled: retrieve
+        # the outcome ourselves so a failed batch logs nothing for it
+        future.add_done_callback(_consume_outcome)
+
+        batch = self._batches.setdefault(schema_name, [])
+        batch.append((order, future))
+        if len(batch) >= self.max_size:
+            self._flush_now(schema_name)
+        elif schema_name not in self._timers:
+            self._timers[schema_name] = loop.call_later(
+                self.max_wait, self._flush_now, schema_name
+            )
+
+        # Shielded: a caller that goes away doesn't fail the rest of the batch
+        return await asyncio.shield(future)
+
+    def _flush_now(self, schema_name: str):
+        timer = self._timers.pop(schema_name, None)
+        if timer:
+            timer.cancel()
+        batch = self._batches.pop(schema_name, None)
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._flush(schema_name, batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, schema_name: str, batch: List[Entry]):
+        try:
+            async with tenant_connection(schema_name) as conn:
+                results = await insert_orders(conn, [order for order, _ in batch])
+        except Exception as e:
+            # Nothing was written (single statement): every caller fails
+            logger.error(
+                f"Order batch of {len(batch)} failed for {schema_name}: {e}"
+            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        # Ticket order, after the whole batch is committed
+        for result in results:
+            await manager.broadcast_to_tenant(
+                schema_name, {"event": "new_order", "order": result}
+            )
+
+
+def _consume_outcome(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
+
+# Global Instance
+order_batcher = OrderBatcher(
+    max_size=settings.ORDER_BATCH_MAX_SIZE,
+    max_wait=settings.ORDER_BATCH_MAX_WAIT_MS / 1000,
+)
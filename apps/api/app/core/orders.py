@@ -0,0 +1,169 @@
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.price_book import PriceBook, PricedGroup
+from app.core.tickets import next_ticket_statement
+from app.db.models import Order
+
+orders = Order.__table__
+
+
+@dataclass
+class PricedCart:
+    total_amount: int  # In cents
+    items: List[dict]  # Snapshot stored on the order
+
+
+def price_cart(book: PriceBook, cart) -> PricedCart:
+    """
+    Prices the requested lines (objects with `id`, `qty` and `modifiers`)
+    from the price book only: client-sent prices are never used. Unknown
+    items, and modifiers that don't belong to the item, are skipped.
+    Raises 400 for unavailable items and modifier selections outside a
+    group's min_selection/max_selection.
+    """
+    grand_total = 0
+    items_snapshot = []
+
+    for item_in in cart:
+        item = book.items.get(item_in.id)
+        if not item:
+            continue
+        if not item.is_available:
+            raise HTTPException(
+                status_code=400, detail=f"{item.name} is currently unavailable"
+            )
+
+        item_total_cents = item.price
+        modifiers_snapshot = []
+        selected = Counter()
+        for mod_in in item_in.modifiers:
+            option = book.options.get(mod_in.optionId)
+            if not option or option.group_id not in item.group_ids:
+                continue
+            selected[option.group_id] += 1
+            item_total_cents += option.price_adjustment
+            modifiers_snapshot.append(
+                {
+                    "id": str(mod_in.optionId),
+                    "name": option.name,
+                    "price": option.price_adjustment,
+                }
+            )
+
+        for group_id in item.group_ids:
+            check_selection(item.name, book.groups[group_id], selected[group_id])
+
+        line_total = item_total_cents * item_in.qty
+        grand_total += line_total
+
+        items_snapshot.append(
+            {
+                "id": str(item_in.id),
+                "name": item.name,
+                "qty": item_in.qty,
+                "price_snapshot": item.price,
+                "modifiers": modifiers_snapshot,
+                "line_total": line_total,
+            }
+        )
+
+    return PricedCart(total_amount=grand_total, items=items_snapshot)
+
+
+def check_selection(item_name: str, group: PricedGroup, count: int):
+    if count < group.min_selection:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{item_name}: choose at least {group.min_selection} "
+            f"option(s) for {group.name}",
+        )
+    if group.max_selection is not None and count > group.max_selection:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{item_name}: choose at most {group.max_selection} "
+            f"option(s) for {group.name}",
+        )
+
+
+@dataclass
+class PendingOrder:
+    cart: PricedCart
+    customer_name: str
+    table_number: Optional[str]
+
+
+async def insert_orders(
+    conn: AsyncConnection, pending: Sequence[PendingOrder]
+) -> List[dict]:
+    """
+    Reserves one daily ticket number per order and inserts all of them in ONE
+    statement: the ticket counter upsert (bumped by len(pending)) is a CTE
+    that the multi-row INSERT ... RETURNING numbers its rows from. On an
+    autocommit connection that is the whole transaction: if the insert fails
+    the counter isn't bumped either.
+    Returns the orders as broadcast to the KDS, in the order given.
+    """
+    created_at = datetime.utcnow()
+    count = len(pending)
+    ticket = next_ticket_statement(created_at.date(), count).cte("ticket")
+    last_number = select(ticket.c.last_number).scalar_subquery()
+
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "customer_name": order.customer_name,
+            "table_number": order.table_number,
+            # Tickets are handed out in submission order
+            "ticket_number": last_number - (count - 1 - i),
+            "status": "PENDING",
+            "total_amount": order.cart.total_amount,
+            "items": order.cart.items,
+            "created_at": created_at,
+        }
+        for i, order in enumerate(pending)
+    ]
+    stmt = (
+        insert(orders)
+        .values(rows)
+        .add_cte(ticket)
+        .returning(orders.c.id, orders.c.ticket_number, orders.c.status)
+    )
+    inserted = {row.id: row for row in await conn.execute(stmt)}
+
+    results = []
+    for values, order in zip(rows, pending):
+        row = inserted[values["id"]]
+        results.append(
+            {
+                "id": str(row.id),
+                "ticket_number": row.ticket_number,
+                "customer_name": order.customer_name,
+                "table_number": order.table_number,
+                "total_amount": order.cart.total_amount,
+                "items": order.cart.items,
+                "status": row.status,
+                "created_at": str(created_at),
+            }
+        )
+    return results
+
+
+async def insert_order(
+    conn: AsyncConnection,
+    cart: PricedCart,
+    customer_name: str,
+    table_number: Optional[str],
+) -> dict:
+    """Single-order `insert_orders`: one round trip per order."""
+    (order,) = await insert_orders(
+        conn, [PendingOrder(cart, customer_name, table_number)]
+    )
+    return order
@@ -0,0 +1,184 @@
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tenant `orders` tables are range-partitioned by created_at: one partition
+# per month (orders_YYYY_MM) plus a default partition catching anything
+# outside them, so inserts never fail on a missing month.
+# Statements below use unqualified names: they run on the caller's
+# search_path (the tenant schema).
+DEFAULT_PARTITION = "orders_default"
+DEFAULT_PARTITION_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF orders DEFAULT"
+)
+
+_MONTH_PARTITION = re.compile(r"^orders_(\d{4})_(\d{2})$")
+
+# Real tenants only: demo sessions are short-lived and only use the default
+# partition (see seed_internal._clone_statements)
+_TENANT_SCHEMAS = text(
+    r"SELECT schema_name FROM public.tenants WHERE schema_name NOT LIKE 'demo\_%'"
+)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month` (negative: before)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _MONTH_PARTITION.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def is_partitioned(connection) -> bool:
+    """Whether `orders` on the search_path is partitioned (older schemas aren't)."""
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass('orders')")
+    ).scalar()
+    return relkind == "p"
+
+
+def create_month_partition(connection, month: date) -> bool:
+    """
+    Adds the partition for `month` unless it exists. Postgres won't add a
+    partition for rows sitting in the default partition, so those are moved
+    into it first. Returns whether a partition was created.
+    """
+    name = partition_name(month)
+    if connection.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+        return False
+
+    bounds = f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    in_range = "created_at >= :start AND created_at < :end"
+    params = {"start": month, "end": add_months(month, 1)}
+
+    stranded = connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"),
+        params,
+    ).scalar()
+    if not stranded:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF orders {bounds}"))
+        return True
+
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    connection.execute(
+        text(
+            f"WITH moved AS ("
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM moved"
+        ),
+        params,
+    )
+    connection.execute(text(f"ALTER TABLE orders ATTACH PARTITION {name} {bounds}"))
+    return True
+
+
+def ensure_order_partitions(connection, today: Optional[date] = None) -> int:
+    """
+    Default partition plus one partition per month from the current one to
+    ORDERS_PARTITION_MONTHS_AHEAD months ahead. Returns how many were created.
+    """
+    current = (today or datetime.utcnow().date()).replace(day=1)
+    connection.execute(text(DEFAULT_PARTITION_DDL))
+    return sum(
+        create_month_partition(connection, add_months(current, i))
+        for i in range(settings.ORDERS_PARTITION_MONTHS_AHEAD + 1)
+    )
+
+
+def expired_partitions(connection, today: Optional[date] = None) -> List[str]:
+    """Month partitions older than ORDERS_ARCHIVE_AFTER_MONTHS."""
+    if settings.ORDERS_ARCHIVE_AFTER_MONTHS <= 0:
+        return []
+    current = (today or datetime.utcnow().date()).replace(day=1)
+    cutoff = add_months(current, -settings.ORDERS_ARCHIVE_AFTER_MONTHS)
+
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('orders')"
+        )
+    ).scalars()
+    return sorted(
+        name for name in names if (partition_month(name) or cutoff) < cutoff
+    )
+
+
+def archive_partition(connection, schema: str, name: str):
+    """
+    Detaches a month partition and moves it to ORDERS_ARCHIVE_SCHEMA as
+    `<schema>_<partition>`: its rows leave every tenant query but stay
+    restorable (ATTACH PARTITION).
+    """
+    archive = settings.ORDERS_ARCHIVE_SCHEMA
+    archived = f"{schema}_{name}"
+    connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive}"))
+    connection.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+    connection.execute(text(f"ALTER TABLE {name} RENAME TO {archived}"))
+    connection.execute(text(f"ALTER TABLE {archived} SET SCHEMA {archive}"))
+
+
+@dataclass
+class PartitionResult:
+    created: int = 0
+    archived: int = 0
+    failures: int = 0
+
+
+def maintain_order_partitions(engine) -> PartitionResult:
+    """
+    Worker job: creates upcoming month partitions and archives expired ones
+    for every tenant with a partitioned orders table. Each step is its own
+    short transaction; failures are retried on the next run.
+    """
+    result = PartitionResult()
+    with engine.connect() as connection:
+        schemas = connection.execute(_TENANT_SCHEMAS).scalars().all()
+
+    for schema in schemas:
+        try:
+            with engine.begin() as connection:
+                # Partition DDL locks the parent table: don't queue behind orders
+                connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+                connection.execute(text(f"SET LOCAL search_path TO {schema}"))
+                if not is_partitioned(connection):
+                    continue
+                result.created += ensure_order_partitions(connection)
+                expired = expired_partitions(connection)
+
+            for name in expired:
+                with engine.begin() as connection:
+                    connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+                    connection.execute(text(f"SET LOCAL search_path TO {schema}"))
+                    archive_partition(connection, schema, name)
+                result.archived += 1
+        except Exception as e:
+            logger.error(f"Order partition maintenance failed for {schema}: {e}")
+            result.failures += 1
+
+    if result.created or result.archived or result.failures:
+        logger.info(
+            f"Order partitions: created {result.created}, archived "
+            f"{result.archived}, {result.failures} failure(s)"
+        )
+    return result
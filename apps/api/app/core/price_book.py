@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.menu_cache import menu_cache
+from app.db.models import MenuItem, ModifierGroup, ModifierOption
+from app.db.session import tenant_connection
+
+
+@dataclass(frozen=True)
+class PricedItem:
+    name: str
+    price: int  # In cents
+    is_available: bool
+    group_ids: Tuple[UUID, ...] = ()
+
+
+@dataclass(frozen=True)
+class PricedGroup:
+    item_id: UUID
+    name: str
+    min_selection: int
+    max_selection: Optional[int]  # None = no upper bound
+
+
+@dataclass(frozen=True)
+class PricedOption:
+    group_id: UUID
+    name: str
+    price_adjustment: int  # In cents
+
+
+@dataclass(frozen=True)
+class PriceBook:
+    """
+    Everything order pricing and validation needs from a tenant's menu,
+    keyed by UUID: prices, availability, and which item owns each modifier
+    group / which group owns each option.
+    """
+
+    version: Optional[str]
+    items: Dict[UUID, PricedItem]
+    groups: Dict[UUID, PricedGroup]
+    options: Dict[UUID, PricedOption]
+    expires_at: float
+
+
+async def load_price_book(conn: AsyncConnection, version: Optional[str]) -> PriceBook:
+    """Reads the price book from the connection's tenant schema."""
+    item_rows = await conn.execute(
+        select(MenuItem.id, MenuItem.name, MenuItem.price, MenuItem.is_available)
+    )
+    group_rows = await conn.execute(
+        select(
+            ModifierGroup.id,
+            ModifierGroup.item_id,
+            ModifierGroup.name,
+            ModifierGroup.min_selection,
+            ModifierGroup.max_selection,
+        )
+    )
+    option_rows = await conn.execute(
+        select(
+            ModifierOption.id,
+            ModifierOption.group_id,
+            ModifierOption.name,
+            ModifierOption.price_adjustment,
+        )
+    )
+
+    groups = {
+        row.id: PricedGroup(
+            item_id=row.item_id,
+            name=row.name,
+            min_selection=row.min_selection or 0,
+            max_selection=row.max_selection,
+        )
+        for row in group_rows
+    }
+    group_ids: Dict[UUID, list] = {}
+    for group_id, group in groups.items():
+        group_ids.setdefault(group.item_id, []).append(group_id)
+
+    return PriceBook(
+        version=version,
+        items={
+            row.id: PricedItem(
+                name=row.name,
+                price=row.price,
+                # NULL predates the column default: treat as available
+                is_available=row.is_available is not False,
+                group_ids=tuple(group_ids.get(row.id, ())),
+            )
+            for row in item_rows
+        },
+        groups=groups,
+        options={
+            row.id: PricedOption(
+                group_id=row.group_id,
+                name=row.name,
+                price_adjustment=row.price_adjustment or 0,
+            )
+            for row in option_rows
+        },
+        expires_at=time.monotonic() + settings.PRICE_BOOK_TTL_SECONDS,
+    )
+
+
+class PriceBookCache:
+    """
+    Per-schema price books, versioned like the storefront menu cache: admin
+    menu writes bump the schema's menu version (`menu_cache.bump`), which
+    retires the cached book on every process.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._books: "OrderedDict[str, PriceBook]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, schema_name: str) -> PriceBook:
+        """
+        Cached price book for the schema. Only a miss checks out a database
+        connection.
+        """
+        version = await menu_cache.version_async(schema_name)
+        if version is not None:
+            with self._lock:
+                book = self._books.get(schema_name)
+                if (
+                    book
+                    and book.version == version
+                    and book.expires_at > time.monotonic()
+                ):
+                    self._books.move_to_end(schema_name)
+                    return book
+
+        async with tenant_connection(schema_name) as conn:
+            book = await load_price_book(conn, version)
+        if version is None:
+            # Unknown version: use it, but don't keep it
+            return book
+
+        with self._lock:
+            self._books[schema_name] = book
+            self._books.move_to_end(schema_name)
+            while len(self._books) > self.max_entries:
+                self._books.popitem(last=False)
+        return book
+
+
+# Global Instance
+price_books = PriceBookCache(max_entries=settings.PRICE_BOOK_MAX_ENTRIES)
@@ -1,42 +1,292 @@
-import redis
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
 from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
 from app.core.config import settings
+from app.core.idempotency import idempotent_replay
+from app.core.redis import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Sliding window over a sorted set of request timestamps (ms), evaluated
+# atomically on the server in a single round trip. Uses the Redis clock so
+# that all API processes agree on the window.
+# ARGV[4] requests were already admitted by a local tier and are recorded
+# unconditionally; ARGV[5] = 1 also checks (and records) the current request.
+# Returns {allowed, count, retry_after_ms}.
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local member = ARGV[3]
+local pending = tonumber(ARGV[4])
+local check = tonumber(ARGV[5])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+for i = 1, pending do
+    redis.call('ZADD', key, now, member .. ':' .. i)
+end
+local count = redis.call('ZCARD', key)
+
+if check == 0 then
+    redis.call('PEXPIRE', key, window)
+    return {1, count, 0}
+end
+
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return {0, count, tonumber(oldest[2]) + window - now}
+end
+
+redis.call('ZADD', key, now, member)
+redis.call('PEXPIRE', key, window)
+return {1, count + 1, 0}
+"""
+
+sliding_window = async_redis_client.register_script(SLIDING_WINDOW_LUA)
+
+
+def client_ip(request: Request) -> str:
+    # Resolve real IP behind Nginx (first hop of X-Forwarded-For)
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host
+
+
+@dataclass
+class _Bucket:
+    tokens: float  # Estimated allowance left in the window
+    pending: int = 0  # Admitted locally, not yet recorded in Redis
+    synced_at: float = 0.0
+    updated_at: float = 0.0
+
+
+class LocalBuckets:
+    """
+    Per-process token buckets in front of the Redis sliding window.
 
-# Initialize Redis Pool
-pool = redis.ConnectionPool(
-    host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True
-)
-redis_client = redis.Redis(connection_pool=pool)
+    A key is admitted locally while its bucket holds more than the reserve
+    (`1 - local_fraction` of the limit) and its last sync is fresher than
+    `flush_seconds`; near the threshold every request goes to Redis. With N
+    processes the global limit can be overshot by at most N local budgets:
+    `local_fraction=0` disables the tier (exact, one trip per request).
+
+    Memory is bounded to `max_keys` (least recently used first) and idle
+    keys are dropped on flush.
+    """
+
+    def __init__(
+        self,
+        times: int,
+        seconds: int,
+        local_fraction: float,
+        flush_seconds: float,
+        max_keys: int,
+        idle_seconds: float,
+    ):
+        self.times = times
+        self.rate = times / seconds  # Tokens regained per second
+        self.reserve = times * (1 - local_fraction)
+        self.flush_seconds = flush_seconds
+        self.max_keys = max_keys
+        self.idle_seconds = idle_seconds
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        # Pending counts of evicted buckets, recorded on the next flush
+        self._unflushed: Dict[str, int] = {}
+
+    def get(self, key: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(tokens=self.times, updated_at=now)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                old_key, old = self._buckets.popitem(last=False)
+                self._keep_pending(old_key, old)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(
+                self.times, bucket.tokens + (now - bucket.updated_at) * self.rate
+            )
+            bucket.updated_at = now
+        return bucket
+
+    def admit(self, bucket: _Bucket, now: float) -> bool:
+        """Admits the request without Redis if the bucket allows it."""
+        if not bucket.synced_at or now - bucket.synced_at >= self.flush_seconds:
+            return False
+        if bucket.tokens - 1 < self.reserve:
+            return False
+        return self.take(bucket)
+
+    def take(self, bucket: _Bucket) -> bool:
+        """Plain local token bucket (also used while Redis is unreachable)."""
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        bucket.pending += 1
+        return True
+
+    def synced(self, bucket: _Bucket, count: int, now: float):
+        # Requests admitted locally while the sync was in flight stay pending
+        bucket.tokens = self.times - count - bucket.pending
+        bucket.synced_at = now
+
+    def drain(self, now: float) -> Dict[str, int]:
+        """
+        Collects the pending counts to record in Redis and drops idle keys.
+        """
+        pending = self._unflushed
+        self._unflushed = {}
+        for key, bucket in list(self._buckets.items()):
+            if bucket.pending:
+                pending[key] = pending.get(key, 0) + bucket.pending
+                bucket.pending = 0
+            if now - bucket.updated_at >= self.idle_seconds:
+                del self._buckets[key]
+        return pending
+
+    def _keep_pending(self, key: str, bucket: _Bucket):
+        if bucket.pending:
+            self._unflushed[key] = self._unflushed.get(key, 0) + bucket.pending
 
 
 class RateLimiter:
     """
-    Rolling window rate limiter based on Client IP.
+    Sliding window rate limiter, per client IP or per tenant.
+    A local token-bucket tier answers the common case without Redis (see
+    `LocalBuckets`), and the limiter keeps enforcing per-process limits when
+    Redis is unreachable.
     """
 
-    def __init__(self, times: int = 3, seconds: int = 60):
+    def __init__(
+        self,
+        times: int = 3,
+        seconds: int = 60,
+        scope: str = "ip",
+        detail: str = "Too many orders placed. Please wait a moment.",
+        local_fraction: Optional[float] = None,
+    ):
+        if scope not in ("ip", "tenant"):
+            raise ValueError(f"Unknown rate limit scope: {scope}")
         self.times = times
         self.seconds = seconds
+        self.scope = scope
+        self.detail = detail
+        self.local = LocalBuckets(
+            times,
+            seconds,
+            local_fraction=(
+                settings.RATE_LIMIT_LOCAL_FRACTION
+                if local_fraction is None
+                else local_fraction
+            ),
+            flush_seconds=settings.RATE_LIMIT_FLUSH_SECONDS,
+            max_keys=settings.RATE_LIMIT_MAX_KEYS,
+            idle_seconds=settings.RATE_LIMIT_IDLE_SECONDS,
+        )
+        self._next_flush = 0.0
+        self._degraded = False
+        self._retry_at = 0.0  # While degraded, no Redis calls before this
+        # Strong references to flush tasks
+        self._pending: Set[asyncio.Task] = set()
+
+    def identity(self, request: Request) -> str:
+        if self.scope == "tenant":
+            # Resolved by TenantMiddleware; demo sessions get their own schema
+            context = request.state.tenant
+            return context.schema_name or context.host
+        return client_ip(request)
 
     async def __call__(self, request: Request):
-        # Resolve real IP behind Nginx
-        client_ip = request.headers.get("x-forwarded-for") or request.client.host
+        if idempotent_replay(request) is not None:
+            # Retry answered from the idempotency store: no work, no budget
+            return
+
+        # Unique key per scope + identity + Endpoint path
+        key = f"rate_limit:{self.scope}:{self.identity(request)}:{request.url.path}"
+        now = time.monotonic()
+        self._schedule_flush(now)
 
-        # Unique key per IP + Endpoint path
-        key = f"rate_limit:{client_ip}:{request.url.path}"
+        bucket = self.local.get(key, now)
+        if self.local.admit(bucket, now):
+            return
 
-        # Check current count
-        current_count = redis_client.get(key)
+        if self._degraded and now < self._retry_at:
+            # Redis failed recently: don't make every request wait on it
+            allowed = self.local.take(bucket)
+            retry_after_ms = 1000 / self.local.rate
+        else:
+            allowed, retry_after_ms = await self._check(key, bucket)
 
-        if current_count and int(current_count) >= self.times:
+        if not allowed:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many orders placed. Please wait a moment.",
+                detail=self.detail,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after_ms / 1000)))},
             )
 
-        # Increment and set expiry if new
-        pipe = redis_client.pipeline()
-        pipe.incr(key)
-        if not current_count:
-            pipe.expire(key, self.seconds)
-        pipe.execute()
+    async def _check(self, key: str, bucket: _Bucket):
+        """Checks the request against Redis. Returns (allowed, retry_after_ms)."""
+        # Taken out of the bucket before awaiting, so a flush running meanwhile
+        # doesn't record the same hits again
+        recorded, bucket.pending = bucket.pending, 0
+        try:
+            allowed, count, retry_after_ms = await self._run(key, recorded, check=True)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            # Degrade to the per-process bucket; pending hits sync later
+            bucket.pending += recorded
+            self._retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+            if not self._degraded:
+                self._degraded = True
+                logger.warning(f"Rate limiter falling back to local buckets: {e!r}")
+            return self.local.take(bucket), 1000 / self.local.rate
+
+        if self._degraded:
+            self._degraded = False
+            logger.info("Rate limiter reconnected to Redis")
+        self.local.synced(bucket, count, time.monotonic())
+        return allowed, retry_after_ms
+
+    async def _run(self, key: str, pending: int, check: bool):
+        return await asyncio.wait_for(
+            sliding_window(
+                keys=[key],
+                args=[
+                    self.seconds * 1000,
+                    self.times,
+                    uuid.uuid4().hex,
+                    pending,
+                    int(check),
+                ],
+            ),
+            settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+        )
+
+    def _schedule_flush(self, now: float):
+        if now < self._next_flush:
+            return
+        self._next_flush = now + self.local.flush_seconds
+        task = asyncio.get_running_loop().create_task(self._flush(now))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _flush(self, now: float):
+        """Records locally admitted requests in Redis."""
+        for key, count in self.local.drain(now).items():
+            try:
+                await self._run(key, count, check=False)
+            except (RedisError, OSError, asyncio.TimeoutError):
+                # Redis is down: those hits only count locally
+                pass
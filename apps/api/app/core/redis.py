@@ -0,0 +1,14 @@
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+# Shared Redis clients.
+# The sync client serves threadpool endpoints, the async one the event loop.
+pool = redis.ConnectionPool(
+    host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True
+)
+redis_client = redis.Redis(connection_pool=pool)
+
+async_redis_client = aioredis.Redis(
+    host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True
+)
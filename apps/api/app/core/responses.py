@@ -0,0 +1,76 @@
+import json
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson (stdlib json if it isn't installed).
+    Content must already be JSON-compatible: no jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def render_model(adapter: TypeAdapter, data: Any) -> Response:
+    """
+    Serializes `data` straight to JSON bytes with the schema's compiled
+    serializer. Returning a Response makes FastAPI skip its own response_model
+    pass (validate, jsonable_encoder, json.dumps).
+    """
+    data = adapter.validate_python(data, from_attributes=True)
+    return Response(content=adapter.dump_json(data), media_type="application/json")
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: `python -m app.core.responses`
+    # Compares FastAPI's default rendering of a response_model (approximated
+    # by validate + jsonable_encoder + JSONResponse) with the fast path.
+    import timeit
+    import uuid
+    from datetime import datetime
+    from typing import List
+
+    from fastapi.encoders import jsonable_encoder
+
+    from app.schemas.order import OrderDetail
+
+    adapter = TypeAdapter(List[OrderDetail])
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "ticket_number": i,
+            "customer_name": f"Guest {i}",
+            "table_number": str(i % 20),
+            "status": "PENDING",
+            "total_amount": 2450,
+            "items": [{"id": str(uuid.uuid4()), "name": "Burger", "qty": 2}] * 3,
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(200)
+    ]
+
+    def default_path():
+        JSONResponse(jsonable_encoder(adapter.validate_python(rows)))
+
+    def fast_path():
+        render_model(adapter, rows)
+
+    for name, fn in (("default", default_path), ("fast", fast_path)):
+        seconds = min(timeit.repeat(fn, number=100, repeat=5)) / 100
+        print(f"{name:>8}: {seconds * 1000:.3f} ms per response (200 orders)")
@@ -1,5 +1,9 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union, Dict
+from typing import Any, Union, Dict, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -36,3 +40,39 @@ def create_access_token(
     # Use the local SECRET_KEY and HS256 for internal tokens
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
+
+
+# Verified claims per token digest: (exp timestamp, claims).
+# Guarded by a lock, sync endpoints decode from the threadpool.
+_token_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies a locally signed JWT and returns its claims.
+    Verified claims are kept in a small LRU until the token's `exp`, so hot
+    tokens skip signature checks and parsing. Raises `JWTError` like `jwt.decode`.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry:
+            expires_at, claims = entry
+            if expires_at > now:
+                _token_cache.move_to_end(digest)
+                return dict(claims)
+            del _token_cache[digest]
+
+    # Expired tokens fall through and fail here with ExpiredSignatureError
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    expires_at = claims.get("exp")
+    if isinstance(expires_at, (int, float)):
+        with _token_cache_lock:
+            _token_cache[digest] = (expires_at, claims)
+            while len(_token_cache) > settings.TOKEN_CACHE_MAX_ENTRIES:
+                _token_cache.popitem(last=False)
+    return dict(claims)
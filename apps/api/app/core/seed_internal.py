@@ -1,7 +1,12 @@
 import uuid
+import hashlib
 import logging
+from functools import lru_cache
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 from app.db.models import (
     Tenant,
@@ -13,6 +18,13 @@ from app.db.models import (
 )
 from app.db.base import Base
 from app.core.config import settings
+from app.db.session import bind_tenant
+from app.core.tickets import seed_ticket_counter
+from app.core.partitions import (
+    DEFAULT_PARTITION_DDL,
+    ensure_order_partitions,
+    is_partitioned,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -239,6 +251,27 @@ OTHER_SEEDS = [
 SEEDS = [DEMO_TENANT_SEED, *OTHER_SEEDS]
 
 
+def create_tenant_tables(connection):
+    """
+    Creates any missing tenant tables and indexes in the schema the
+    connection's search_path points at. Safe to re-run on existing schemas.
+    """
+    tenant_tables = [t for t in Base.metadata.sorted_tables if t.schema != "public"]
+    Base.metadata.create_all(bind=connection, tables=tenant_tables)
+
+    # A backfilled counter table must continue today's ticket numbering
+    seed_ticket_counter(connection)
+
+    # create_all() only emits indexes for tables it creates itself
+    for table in tenant_tables:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+    # Schemas provisioned before partitioning keep their plain orders table
+    if is_partitioned(connection):
+        ensure_order_partitions(connection)
+
+
 def provision_tenant_internal(
     db: Session, seed_data: dict, engine, skip_public_record: bool = False
 ):
@@ -250,7 +283,7 @@ def provision_tenant_internal(
 
     # 1. Tenant Record (Public)
     if not skip_public_record:
-        db.execute(text("SET search_path TO public"))
+        bind_tenant(db, "public")
         existing = db.query(Tenant).filter(Tenant.domain == seed_data["domain"]).first()
 
         if existing:
@@ -288,17 +321,14 @@ def provision_tenant_internal(
     # 3. Table Creation
     try:
         with engine.begin() as connection:
-            connection.execute(text(f"SET search_path TO {schema}"))
-            tenant_tables = [
-                t for t in Base.metadata.sorted_tables if t.schema != "public"
-            ]
-            Base.metadata.create_all(bind=connection, tables=tenant_tables)
+            connection.execute(text(f"SET LOCAL search_path TO {schema}"))
+            create_tenant_tables(connection)
     except Exception as e:
         logger.error(f"Failed to create tables for {schema}: {e}")
         return
 
     # 4. Data Seeding
-    db.execute(text(f"SET search_path TO {schema}"))
+    bind_tenant(db, schema)
 
     # If data exists, skip (unless we want to force updates, but keep it simple)
     if db.query(Category).count() > 0:
@@ -355,6 +385,102 @@ def provision_tenant_internal(
     logger.info(f"Seeding complete for {schema}")
 
 
+# --- DEMO TEMPLATE ---
+# Demo sessions are cloned from a fully seeded template schema with set-based
+# SQL instead of being provisioned (DDL + row-by-row seeding) on every signup.
+
+
+def build_demo_template(db: Session, engine):
+    """
+    (Re)builds the seeded template schema that demo sessions are cloned from.
+    The new template is built under a staging name and swapped in atomically,
+    so concurrent clones see either the old or the new one.
+    """
+    template = settings.DEMO_TEMPLATE_SCHEMA
+    staging = f"{template}_next"
+
+    db.execute(text(f"DROP SCHEMA IF EXISTS {staging} CASCADE"))
+    db.commit()
+
+    template_seed = DEMO_TENANT_SEED.copy()
+    template_seed["schema_name"] = staging
+    provision_tenant_internal(db, template_seed, engine, skip_public_record=True)
+
+    # provision_tenant_internal() logs and returns on failure
+    seeded = db.execute(text(f"SELECT count(*) FROM {staging}.categories")).scalar()
+    if not seeded:
+        db.rollback()
+        raise RuntimeError(f"Demo template {staging} was not seeded")
+
+    db.execute(text(f"DROP SCHEMA IF EXISTS {template} CASCADE"))
+    db.execute(text(f"ALTER SCHEMA {staging} RENAME TO {template}"))
+    db.commit()
+    logger.info(f"Demo template {template} ready")
+
+
+@lru_cache(maxsize=1)
+def _clone_statements() -> List[str]:
+    """
+    Schema-agnostic DDL + copy statements for every tenant table, compiled once.
+    Table names are unqualified and resolve through the clone's search_path.
+    """
+    dialect = postgresql.dialect()
+    quote = dialect.identifier_preparer.quote
+    tenant_tables = [t for t in Base.metadata.sorted_tables if t.schema != "public"]
+
+    statements = []
+    for table in tenant_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+        for index in table.indexes:
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)).strip())
+        if table is Order.__table__:
+            # Demo sessions are short-lived: the default partition holds it all
+            statements.append(DEFAULT_PARTITION_DDL)
+
+    for table in tenant_tables:
+        columns = ", ".join(quote(c.name) for c in table.columns)
+        statements.append(
+            f"INSERT INTO {quote(table.name)} ({columns}) "
+            f"SELECT {columns} FROM {{template}}.{quote(table.name)}"
+        )
+    return statements
+
+
+def tenant_ddl_fingerprint() -> str:
+    """Short hash of the tenant DDL; changes whenever the tenant models do."""
+    return hashlib.sha1("\n".join(_clone_statements()).encode()).hexdigest()[:12]
+
+
+def copy_demo_template(connection, schema: str):
+    """
+    Creates `schema` as a copy of the demo template (tables, indexes and rows)
+    on the caller's connection and transaction. The whole clone is sent as one
+    script.
+    """
+    script = ";\n".join(
+        [
+            f"CREATE SCHEMA {schema}",
+            f"SET LOCAL search_path TO {schema}",
+            *(
+                stmt.replace("{template}", settings.DEMO_TEMPLATE_SCHEMA)
+                for stmt in _clone_statements()
+            ),
+        ]
+    )
+    connection.exec_driver_sql(script, execution_options={"no_parameters": True})
+
+
+def clone_demo_schema(engine, schema: str, tenant_record: Optional[dict] = None):
+    """
+    Clones the demo template into `schema` in a single transaction, together
+    with the optional public tenant row.
+    """
+    with engine.begin() as connection:
+        copy_demo_template(connection, schema)
+        if tenant_record:
+            connection.execute(Tenant.__table__.insert().values(**tenant_record))
+
+
 def init_db(db: Session, engine):
     for seed in SEEDS:
         try:
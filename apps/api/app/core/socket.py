@@ -1,43 +1,439 @@
-from typing import Dict, List
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import (
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 from fastapi import WebSocket
 
+from app.core.config import settings
+from app.core.redis import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Receives the tenant schema and the already-serialized JSON payload
+DeliverFn = Callable[[str, str], Awaitable[None]]
+
+# (current sequence number, missed events) -- see `replay()`
+Replay = Tuple[Optional[int], Optional[List[str]]]
+
+
+def _with_seq(seq: int, payload: str) -> str:
+    # Payloads are serialized JSON objects: splice the sequence number in front
+    return f'{{"seq":{seq},{payload[1:]}'
+
+
+class LocalBroadcastBackend:
+    """
+    Single-process fan-out: events go straight to this process's sockets.
+    Every event gets a per-tenant sequence number, and the most recent
+    `buffer_size` events are kept for `replay()`. Like the Redis keys, a
+    tenant's sequence and buffer are dropped `buffer_ttl` seconds after its
+    last event.
+    """
+
+    def __init__(self, buffer_size: int = 200, buffer_ttl: int = 3600):
+        self.buffer_size = buffer_size
+        self.buffer_ttl = buffer_ttl
+        self._seq: Dict[str, int] = {}
+        self._log: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._expires: Dict[str, float] = {}
+        self._next_prune = 0.0
+
+    def bind(self, deliver: DeliverFn):
+        self.deliver = deliver
+
+    async def publish(self, schema_name: str, payload: str):
+        now = time.monotonic()
+        self._prune(now)
+        seq = self._seq.get(schema_name)
+        # A new (or expired) sequence continues from the clock, so numbers
+        # never go back for screens that stayed connected
+        seq = seq + 1 if seq else int(time.time() * 1000)
+        self._seq[schema_name] = seq
+        self._expires[schema_name] = now + self.buffer_ttl
+        message = _with_seq(seq, payload)
+
+        log = self._log.get(schema_name)
+        if log is None:
+            log = self._log[schema_name] = deque(maxlen=self.buffer_size)
+        log.append((seq, message))
+
+        await self.deliver(schema_name, message)
+
+    def _prune(self, now: float):
+        # Sweeps at most once a minute; replay() ignores expired entries anyway
+        if now < self._next_prune:
+            return
+        self._next_prune = now + min(self.buffer_ttl, 60)
+        for schema_name, expires_at in list(self._expires.items()):
+            if expires_at <= now:
+                self._drop(schema_name)
+
+    def _drop(self, schema_name: str):
+        self._seq.pop(schema_name, None)
+        self._log.pop(schema_name, None)
+        self._expires.pop(schema_name, None)
+
+    async def replay(self, schema_name: str, since: Optional[int]) -> Replay:
+        """
+        Returns the current sequence number and the events after `since`,
+        or None for the events when they are no longer all buffered.
+        """
+        if self._expires.get(schema_name, math.inf) <= time.monotonic():
+            self._drop(schema_name)
+        current = self._seq.get(schema_name, 0)
+        if since is None:
+            return current, []
+        log = self._log.get(schema_name)
+        if since > current or (since < current and (not log or log[0][0] > since + 1)):
+            return current, None
+        return current, [message for seq, message in (log or ()) if seq > since]
+
+    async def subscribe(self, schema_name: str):
+        pass
+
+    async def unsubscribe(self, schema_name: str):
+        pass
+
+
+# Numbers, buffers and publishes an event in one atomic step, so the
+# channel order always matches the sequence numbers. The counter and the
+# buffer share the buffer TTL.
+PUBLISH_LUA = """
+local seq = redis.call('INCR', KEYS[1])
+if seq == 1 then
+    -- New or expired counter: continue from the clock (ms), so numbers never
+    -- go back for screens that stayed connected
+    local time = redis.call('TIME')
+    seq = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    redis.call('SET', KEYS[1], seq)
+end
+local message = '{"seq":' .. seq .. ',' .. string.sub(ARGV[1], 2)
+redis.call('ZADD', KEYS[2], seq, message)
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[2]) + 1))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('PUBLISH', ARGV[4], message)
+return seq
+"""
+
+
+class RedisBroadcastBackend:
+    """
+    Cross-process fan-out over Redis pub/sub.
+    Every tenant schema gets its own channel, and a process only subscribes
+    to the schemas it currently holds sockets for.
+    Sequence numbers and the replay buffer (a sorted set scored by sequence
+    number) live in Redis, so they are shared by all processes.
+    """
+
+    def __init__(
+        self,
+        client,
+        channel_prefix: str = "kds:",
+        buffer_size: int = 200,
+        buffer_ttl: int = 3600,
+    ):
+        self.client = client
+        self.channel_prefix = channel_prefix
+        self.buffer_size = buffer_size
+        self.buffer_ttl = buffer_ttl
+        self._publish = client.register_script(PUBLISH_LUA)
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def bind(self, deliver: DeliverFn):
+        self.deliver = deliver
+
+    def _channel(self, schema_name: str) -> str:
+        return f"{self.channel_prefix}{schema_name}"
+
+    def _keys(self, schema_name: str) -> List[str]:
+        return [
+            f"{self.channel_prefix}seq:{schema_name}",
+            f"{self.channel_prefix}log:{schema_name}",
+        ]
+
+    async def publish(self, schema_name: str, payload: str):
+        try:
+            await self._publish(
+                keys=self._keys(schema_name),
+                args=[
+                    payload,
+                    self.buffer_size,
+                    self.buffer_ttl,
+                    self._channel(schema_name),
+                ],
+            )
+        except Exception as e:
+            # Redis outage: at least reach the screens connected to this process
+            logger.error(
+                f"KDS publish failed for {schema_name}, delivering locally: {e}"
+            )
+            await self.deliver(schema_name, payload)
+
+    async def replay(self, schema_name: str, since: Optional[int]) -> Replay:
+        """
+        Returns the current sequence number and the events after `since`,
+        or None for the events when they are no longer all buffered.
+        """
+        seq_key, log_key = self._keys(schema_name)
+        try:
+            if since is None:
+                return int(await self.client.get(seq_key) or 0), []
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(seq_key)
+            pipe.zrange(log_key, 0, 0, withscores=True)
+            pipe.zrangebyscore(log_key, f"({since}", "+inf")
+            current, oldest, missed = await pipe.execute()
+        except Exception as e:
+            logger.error(f"KDS replay failed for {schema_name}: {e}")
+            return None, None
+
+        current = int(current or 0)
+        if since > current:
+            # Counter was reset
+            return current, None
+        if since < current and (not oldest or int(oldest[0][1]) > since + 1):
+            return current, None
+        return current, missed
+
+    async def subscribe(self, schema_name: str):
+        """
+        Raises when the SUBSCRIBE fails: the pubsub connection only restores
+        channels that were subscribed successfully, so the caller must retry.
+        """
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self._channel(schema_name))
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def unsubscribe(self, schema_name: str):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self._channel(schema_name))
+        except Exception as e:
+            logger.error(f"KDS unsubscribe failed for {schema_name}: {e}")
+
+    async def _read_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"KDS subscription error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if not message or message.get("type") != "message":
+                continue
+
+            schema_name = message["channel"][len(self.channel_prefix) :]
+            try:
+                await self.deliver(schema_name, message["data"])
+            except Exception as e:
+                logger.error(f"KDS delivery failed for {schema_name}: {e}")
+
+
+class KitchenClient:
+    """
+    One connected KDS screen with its own bounded outbox.
+    A dedicated sender task drains the outbox, so a slow screen never holds up
+    delivery to the others.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+
 
 class ConnectionManager:
     """
     Manages WebSocket connections for the Kitchen Display System.
     Connections are grouped by Tenant Schema Name to ensure isolation.
+    Events travel through a pluggable backend so that every process holding
+    sockets for a tenant receives them.
     """
 
-    def __init__(self):
-        # Key: schema_name, Value: List of active WebSockets
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(
+        self,
+        backend=None,
+        queue_size: int = 100,
+        send_timeout: float = 5.0,
+    ):
+        # Key: schema_name, Value: active WebSockets and their clients
+        self.active_connections: Dict[str, Dict[WebSocket, KitchenClient]] = {}
+        self.backend = backend or LocalBroadcastBackend()
+        self.backend.bind(self._deliver)
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        # Strong references to fire-and-forget tasks
+        self._pending: Set[asyncio.Task] = set()
 
-    async def connect(self, schema_name: str, websocket: WebSocket):
+    async def connect(
+        self, schema_name: str, websocket: WebSocket, since: Optional[int] = None
+    ) -> bool:
+        """
+        Registers a KDS screen. A reconnecting screen passes the last sequence
+        number it saw (`since`) and first receives the events it missed, or a
+        "resync" message when they are no longer buffered (refetch over REST).
+        Either way the screen then gets a "sync" message with the current
+        sequence number, followed by live events. Screens drop events whose
+        `seq` they have already seen.
+        Returns False when the tenant's events can't be subscribed to: the
+        socket is then closed (1013) and the screen retries.
+        """
         await websocket.accept()
+        client = KitchenClient(websocket, self.queue_size)
+
+        # Register before reading the backlog: live events published meanwhile
+        # wait in the outbox, so nothing falls in between.
         if schema_name not in self.active_connections:
-            self.active_connections[schema_name] = []
-        self.active_connections[schema_name].append(websocket)
+            self.active_connections[schema_name] = {websocket: client}
+            try:
+                await self.backend.subscribe(schema_name)
+            except Exception as e:
+                # No event would reach these screens: send them all to retry,
+                # including any that joined while the subscribe was in flight
+                logger.error(f"KDS subscribe failed for {schema_name}: {e}")
+                joined = self.active_connections.get(schema_name, {})
+                for other in list(joined.values()):
+                    if other is not client:
+                        self._evict(schema_name, other)
+                self.disconnect(schema_name, websocket)
+                await self._close(client)
+                return False
+        else:
+            self.active_connections[schema_name][websocket] = client
+
+        current, missed = await self.backend.replay(schema_name, since)
+        if missed is None:
+            intro = [json.dumps({"event": "resync", "seq": current})]
+        else:
+            intro = missed + [json.dumps({"event": "sync", "seq": current})]
+
+        client.sender = asyncio.create_task(self._send_loop(schema_name, client, intro))
+        return True
+
+    async def replay(self, schema_name: str, since: Optional[int]) -> Replay:
+        return await self.backend.replay(schema_name, since)
 
     def disconnect(self, schema_name: str, websocket: WebSocket):
-        if schema_name in self.active_connections:
-            if websocket in self.active_connections[schema_name]:
-                self.active_connections[schema_name].remove(websocket)
-            # Clean up empty keys to save memory
-            if not self.active_connections[schema_name]:
-                del self.active_connections[schema_name]
+        clients = self.active_connections.get(schema_name)
+        if clients is None:
+            return
+
+        client = clients.pop(websocket, None)
+        if client and client.sender and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+
+        # Clean up empty keys to save memory
+        if not clients:
+            del self.active_connections[schema_name]
+            self._spawn(self._release(schema_name))
+
+    async def _release(self, schema_name: str):
+        # A new screen may have connected since the last one left
+        if schema_name not in self.active_connections:
+            await self.backend.unsubscribe(schema_name)
 
     async def broadcast_to_tenant(self, schema_name: str, message: dict):
         """
-        Sends a JSON message to all connected clients for a specific tenant.
+        Publishes a JSON message to all connected clients for a specific tenant,
+        on every process. The payload is serialized exactly once.
+        """
+        await self.backend.publish(schema_name, json.dumps(message))
+
+    async def _deliver(self, schema_name: str, payload: str):
         """
-        if schema_name in self.active_connections:
-            for connection in self.active_connections[schema_name]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    # Handle dead connections gracefully
-                    self.disconnect(schema_name, connection)
+        Queues a serialized message for the clients connected to this process.
+        Never waits on a socket: screens whose outbox is full are evicted.
+        """
+        clients = self.active_connections.get(schema_name)
+        if not clients:
+            return
+
+        # Iterate over a snapshot, eviction mutates the dict
+        for client in list(clients.values()):
+            try:
+                client.outbox.put_nowait(payload)
+            except asyncio.QueueFull:
+                logger.warning(f"KDS client evicted from {schema_name}: outbox full")
+                self._evict(schema_name, client)
+
+    async def _send_loop(
+        self, schema_name: str, client: KitchenClient, intro: Sequence[str] = ()
+    ):
+        try:
+            for payload in intro:
+                await asyncio.wait_for(
+                    client.websocket.send_text(payload), self.send_timeout
+                )
+            while True:
+                payload = await client.outbox.get()
+                await asyncio.wait_for(
+                    client.websocket.send_text(payload), self.send_timeout
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Timed out or dead connection
+            logger.warning(f"KDS client evicted from {schema_name}: {e!r}")
+            self._evict(schema_name, client)
+
+    def _evict(self, schema_name: str, client: KitchenClient):
+        self.disconnect(schema_name, client.websocket)
+        self._spawn(self._close(client))
+
+    async def _close(self, client: KitchenClient):
+        # 1013 "Try Again Later": the screen reconnects and refetches state
+        try:
+            await asyncio.wait_for(
+                client.websocket.close(code=1013), self.send_timeout
+            )
+        except Exception:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+def _build_backend():
+    if settings.BROADCAST_BACKEND == "redis":
+        return RedisBroadcastBackend(
+            async_redis_client,
+            buffer_size=settings.KDS_REPLAY_BUFFER_SIZE,
+            buffer_ttl=settings.KDS_REPLAY_TTL_SECONDS,
+        )
+    return LocalBroadcastBackend(
+        buffer_size=settings.KDS_REPLAY_BUFFER_SIZE,
+        buffer_ttl=settings.KDS_REPLAY_TTL_SECONDS,
+    )
 
 
 # Global Instance
-manager = ConnectionManager()
+manager = ConnectionManager(
+    _build_backend(),
+    queue_size=settings.KDS_SEND_QUEUE_SIZE,
+    send_timeout=settings.KDS_SEND_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Tenant
+
+
+@dataclass(frozen=True)
+class CachedTenant:
+    """
+    Detached, read-only snapshot of a `public.tenants` row.
+    Unlike ORM instances it is not bound to a Session, so it can be shared
+    between requests.
+    """
+
+    id: Any
+    name: str
+    domain: str
+    schema_name: str
+    theme_config: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_model(cls, tenant: Tenant) -> "CachedTenant":
+        return cls(
+            id=tenant.id,
+            name=tenant.name,
+            domain=tenant.domain,
+            schema_name=tenant.schema_name,
+            theme_config=dict(tenant.theme_config or {}),
+        )
+
+
+class TenantCache:
+    """
+    In-process host -> tenant and schema -> tenant cache.
+
+    Entries expire after `ttl_seconds` and the least recently used ones are
+    evicted once `max_entries` is reached. Unknown hosts are remembered for the
+    same TTL. Writers to `public.tenants` must call `invalidate()`; other API
+    processes pick up the change when the TTL runs out.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._by_domain: "OrderedDict[str, Tuple[float, CachedTenant]]" = OrderedDict()
+        self._by_schema: "OrderedDict[str, Tuple[float, CachedTenant]]" = OrderedDict()
+        # Hosts without a tenant, so unknown hosts don't query on every request
+        self._missing_domains: "OrderedDict[str, float]" = OrderedDict()
+        # Sync endpoints run in the threadpool, so guard the dicts.
+        self._lock = threading.Lock()
+
+    # --- Lookups ---
+
+    def get_by_schema(self, db: Session, schema_name: str) -> Optional[CachedTenant]:
+        cached = self._get(self._by_schema, schema_name)
+        if cached:
+            return cached
+
+        stmt = select(Tenant).where(Tenant.schema_name == schema_name)
+        tenant = db.execute(stmt).scalars().first()
+        return self.store(tenant) if tenant else None
+
+    async def get_by_domain_async(
+        self, db: AsyncSession, domain: str
+    ) -> Optional[CachedTenant]:
+        cached = self._get(self._by_domain, domain)
+        if cached or self._is_missing(domain):
+            return cached
+
+        stmt = select(Tenant).where(Tenant.domain == domain)
+        tenant = (await db.execute(stmt)).scalars().first()
+        return self.store(tenant) if tenant else self._store_missing(domain)
+
+    async def get_by_schema_async(
+        self, db: AsyncSession, schema_name: str
+    ) -> Optional[CachedTenant]:
+        cached = self._get(self._by_schema, schema_name)
+        if cached:
+            return cached
+
+        stmt = select(Tenant).where(Tenant.schema_name == schema_name)
+        tenant = (await db.execute(stmt)).scalars().first()
+        return self.store(tenant) if tenant else None
+
+    # --- Maintenance ---
+
+    def store(self, tenant: Tenant) -> CachedTenant:
+        """Snapshots a tenant row and indexes it by both domain and schema."""
+        snapshot = CachedTenant.from_model(tenant)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._put(self._by_domain, snapshot.domain, (expires_at, snapshot))
+            self._put(self._by_schema, snapshot.schema_name, (expires_at, snapshot))
+        return snapshot
+
+    def invalidate(self, domain: Optional[str] = None, schema: Optional[str] = None):
+        """Drops every entry matching the given domain and/or schema."""
+        with self._lock:
+            self._missing_domains.pop(domain, None)
+            for index in (self._by_domain, self._by_schema):
+                stale = [
+                    key
+                    for key, (_, tenant) in index.items()
+                    if tenant.domain == domain or tenant.schema_name == schema
+                ]
+                for key in stale:
+                    del index[key]
+
+    # --- Internals ---
+
+    def _get(self, index: OrderedDict, key: str) -> Optional[CachedTenant]:
+        with self._lock:
+            entry = index.get(key)
+            if not entry:
+                return None
+            expires_at, tenant = entry
+            if expires_at < time.monotonic():
+                del index[key]
+                return None
+            index.move_to_end(key)
+            return tenant
+
+    def _is_missing(self, domain: str) -> bool:
+        with self._lock:
+            expires_at = self._missing_domains.get(domain)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._missing_domains[domain]
+                return False
+            return True
+
+    def _store_missing(self, domain: str) -> None:
+        with self._lock:
+            self._missing_domains[domain] = time.monotonic() + self.ttl_seconds
+            self._missing_domains.move_to_end(domain)
+            while len(self._missing_domains) > self.max_entries:
+                self._missing_domains.popitem(last=False)
+        return None
+
+    def _put(self, index: OrderedDict, key: str, entry: Tuple[float, CachedTenant]):
+        index[key] = entry
+        index.move_to_end(key)
+        while len(index) > self.max_entries:
+            index.popitem(last=False)
+
+
+# Global Instance
+tenant_cache = TenantCache(
+    ttl_seconds=settings.TENANT_CACHE_TTL_SECONDS,
+    max_entries=settings.TENANT_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,91 @@
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from fastapi import HTTPException, Request
+from jose import JWTError
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.core.tenant_cache import CachedTenant, tenant_cache
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """
+    Who a request is for, resolved once by `TenantMiddleware` from the Host
+    header and the bearer token (see `request.state.tenant`).
+    """
+
+    host: str
+    # Verified token claims (read-only); None without a valid token
+    claims: Optional[Mapping[str, Any]] = None
+    # Tenant owning the host. On the demo domain: the generic demo tenant.
+    tenant: Optional[CachedTenant] = None
+    # False when the tenant wasn't looked up (CORS preflights) or the lookup
+    # failed: `tenant` is then unknown rather than missing
+    resolved: bool = True
+
+    @property
+    def is_demo(self) -> bool:
+        return self.host == settings.DEMO_DOMAIN
+
+    @property
+    def target_schema(self) -> Optional[str]:
+        """Personal sandbox assigned to a demo session via its token."""
+        return self.claims.get("target_schema") if self.claims else None
+
+    @property
+    def schema_name(self) -> Optional[str]:
+        """Schema the storefront serves, None for unknown hosts."""
+        if self.is_demo:
+            return self.target_schema or settings.DEMO_SCHEMA
+        return self.tenant.schema_name if self.tenant else None
+
+
+async def build_tenant_context(host: str, token: Optional[str]) -> TenantContext:
+    """
+    Resolves the tenant for a host (port already stripped) and an optional
+    token. Invalid tokens resolve without claims. Lookups go through the
+    tenant cache, so hot hosts cost no query; if one fails (database down)
+    the context is returned unresolved.
+    """
+    claims = None
+    if token:
+        try:
+            claims = MappingProxyType(decode_access_token(token))
+        except JWTError:
+            pass  # Invalid token, fall back to host resolution
+
+    # Sessions only check out a connection on a cache miss
+    try:
+        async with AsyncSessionLocal() as db:
+            if host == settings.DEMO_DOMAIN:
+                tenant = await tenant_cache.get_by_schema_async(
+                    db, settings.DEMO_SCHEMA
+                )
+            else:
+                tenant = await tenant_cache.get_by_domain_async(db, host)
+    except Exception as e:
+        logger.error(f"Tenant resolution failed for {host}: {e}")
+        return TenantContext(host=host, claims=claims, resolved=False)
+
+    return TenantContext(host=host, claims=claims, tenant=tenant)
+
+
+def unresolved_tenant_error() -> HTTPException:
+    """Error for handlers that need a tenant the middleware couldn't look up."""
+    return HTTPException(
+        status_code=503,
+        detail="Tenant lookup unavailable, please retry.",
+        headers={"Retry-After": "1"},
+    )
+
+
+def get_tenant_context(request: Request) -> TenantContext:
+    """Dependency returning the context attached by `TenantMiddleware`."""
+    return request.state.tenant
@@ -8,7 +8,10 @@ from sqlalchemy import (
     JSON,
     ForeignKey,
     Text,
+    Date,
     DateTime,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -26,6 +29,29 @@ class Tenant(Base):
     schema_name = Column(String, unique=True, nullable=False)
     domain = Column(String, unique=True, nullable=False)
     theme_config = Column(JSON, default={})
+    # Demo sessions expire from here (see core.demo_reaper)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Pre-provisioned demo schemas waiting to be claimed by a demo session
+class DemoPoolSchema(Base):
+    __tablename__ = "demo_pool"
+    __table_args__ = {"schema": "public"}
+
+    schema_name = Column(String, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Per-schema progress of the parallel tenant migration runner
+class TenantMigration(Base):
+    __tablename__ = "tenant_migrations"
+    __table_args__ = {"schema": "public"}
+
+    schema_name = Column(String, primary_key=True)
+    revision = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # done, failed
+    error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Lead(Base):
@@ -130,6 +156,22 @@ class ModifierOption(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # KDS board: only open tickets, in arrival order. Stays small however
+        # much history the tenant accumulates.
+        Index(
+            "ix_orders_active_created_at",
+            "created_at",
+            postgresql_where=text("status <> 'COMPLETED'"),
+        ),
+        # Ticket lookup ("order #42 from today")
+        Index("ix_orders_ticket_number_created_at", "ticket_number", "created_at"),
+        # Order history: keyset pagination on (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Monthly range partitions (see core.partitions). The partition key
+        # must be part of the primary key.
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
@@ -142,4 +184,12 @@ class Order(Base):
     status = Column(String, default="PENDING")
     total_amount = Column(Integer, nullable=False)
     items = Column(JSON, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+
+class TicketCounter(Base):
+    __tablename__ = "ticket_counters"
+
+    # One row per (UTC) day; bumped atomically with UPDATE ... RETURNING
+    day = Column(Date, primary_key=True)
+    last_number = Column(Integer, nullable=False, default=0)
@@ -1,16 +1,103 @@
-from sqlalchemy import create_engine, pool
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
-# Use NullPool to ensure connections are closed and not recycled with potentially wrong schemas.
-# This is safer for schema-per-tenant architectures.
+# Pooled engine. Connections are shared between tenants, so the search_path is
+# only ever set per transaction (SET LOCAL, see bind_tenant): nothing leaks into
+# the next checkout and connections need no reset when returned to the pool.
 engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, poolclass=pool.NullPool
+    settings.SQLALCHEMY_DATABASE_URI,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+)
+
+# Async engine (asyncpg) for handlers that run on the event loop.
+# Same pooling rules as the sync engine.
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+)
+
+# Autocommit engine for single-statement writes (see tenant_connection).
+# No pre-ping and nothing to reset on return, so a checkout costs no round
+# trip; pool_recycle retires connections before the server side times out.
+write_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    isolation_level="AUTOCOMMIT",
+    pool_reset_on_return=None,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
 )
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async sessions keep attributes loaded after commit: implicit refreshes
+# would otherwise trigger lazy IO outside of an awaitable.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Session.info key holding the search_path a session is bound to
+SEARCH_PATH_KEY = "search_path"
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_search_path(session, transaction, connection):
+    """
+    Re-applies the bound tenant schema on every new transaction.
+    A commit hands the connection back to the pool, so the next transaction
+    may run on a different connection.
+    """
+    search_path = session.info.get(SEARCH_PATH_KEY)
+    if search_path:
+        connection.exec_driver_sql(f"SET LOCAL search_path TO {search_path}")
+
+
+def search_path_for(schema: str) -> str:
+    if schema == "public":
+        return "public"
+    return f"{schema}, public"
+
+
+def bind_tenant(db: Session, schema: str) -> Session:
+    """
+    Pins a session to a tenant schema for the rest of its lifetime,
+    including transactions started after a commit.
+    """
+    search_path = search_path_for(schema)
+    db.info[SEARCH_PATH_KEY] = search_path
+    if db.in_transaction():
+        # The running transaction started before the binding existed
+        db.execute(text(f"SET LOCAL search_path TO {search_path}"))
+    return db
+
+
+async def bind_tenant_async(db: AsyncSession, schema: str) -> AsyncSession:
+    """
+    Async counterpart of `bind_tenant`.
+    """
+    search_path = search_path_for(schema)
+    db.info[SEARCH_PATH_KEY] = search_path
+    if db.in_transaction():
+        await db.execute(text(f"SET LOCAL search_path TO {search_path}"))
+    return db
+
 
 def get_db():
     db = SessionLocal()
@@ -18,3 +105,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@contextmanager
+def get_tenant_db(schema: str) -> Iterator[Session]:
+    """
+    Standalone session bound to a tenant schema (scripts, jobs, streaming).
+    """
+    db = bind_tenant(SessionLocal(), schema)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def tenant_connection(schema: str) -> AsyncIterator[AsyncConnection]:
+    """
+    Autocommit connection (write_engine) that renders tenant tables
+    schema-qualified (schema_translate_map) instead of relying on the
+    search_path: no pre-ping, SET, BEGIN/COMMIT or reset, so a single-statement
+    write is a single round trip.
+    """
+    async with write_engine.connect() as conn:
+        yield await conn.execution_options(schema_translate_map={None: schema})
@@ -1,6 +1,8 @@
 import logging
+from sqlalchemy import text
 from app.db.session import SessionLocal, engine
-from app.core.seed_internal import init_db
+from app.core.config import settings
+from app.core.seed_internal import init_db, build_demo_template
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,9 +19,21 @@ def init():
         # Create tables explicitly marked for public schema
         public_tables = [t for t in Base.metadata.sorted_tables if t.schema == "public"]
         Base.metadata.create_all(bind=engine, tables=public_tables)
+        # create_all() doesn't add columns to existing tables
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "ALTER TABLE public.tenants ADD COLUMN IF NOT EXISTS "
+                    "created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')"
+                )
+            )
 
         logger.info("Seeding Tenants...")
         init_db(db, engine)
+
+        if settings.DEMO_CLONE_FROM_TEMPLATE:
+            logger.info("Building Demo Template...")
+            build_demo_template(db, engine)
         logger.info("Database initialization completed.")
     except Exception as e:
         logger.error(f"Initialization failed: {e}")
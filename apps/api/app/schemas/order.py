@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List, Optional
+from uuid import UUID
+
+
+class OrderDetail(BaseModel):
+    """An order as stored: KDS board, order history and export."""
+
+    id: UUID
+    ticket_number: int
+    customer_name: str
+    table_number: Optional[str] = None
+    # Nullable column, even though new orders always start as PENDING
+    status: Optional[str] = None
+    total_amount: int
+    items: List[dict]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
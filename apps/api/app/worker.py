@@ -1,2 +1,72 @@
 # Celery Worker Entry Point
 # Responsible for Batch Migrations across schemas.
+#
+# Until those move here, the worker runs the periodic maintenance jobs below
+# as a plain loop: `python -m app.worker`.
+#
+# Tenant migrations: `python -m app.worker migrate [revision]`
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.core.demo_pool import refill_demo_pool
+from app.core.demo_reaper import reap_expired_demos
+from app.core.migrations import run_tenant_migrations
+from app.core.partitions import maintain_order_partitions
+from app.db.session import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def refill_pool():
+    if settings.DEMO_POOL_SIZE > 0:
+        refill_demo_pool(engine)
+
+
+def reap_demos():
+    reap_expired_demos(engine)
+
+
+def order_partitions():
+    maintain_order_partitions(engine)
+
+
+# (job, interval in seconds)
+JOBS = [
+    (refill_pool, settings.DEMO_POOL_REFILL_INTERVAL_SECONDS),
+    (reap_demos, settings.DEMO_REAPER_INTERVAL_SECONDS),
+    (order_partitions, settings.ORDERS_PARTITION_INTERVAL_SECONDS),
+]
+
+
+def main():
+    logger.info("Worker started")
+    next_run = {job: 0.0 for job, _ in JOBS}
+    while True:
+        for job, interval in JOBS:
+            if time.monotonic() < next_run[job]:
+                continue
+            try:
+                job()
+            except Exception as e:
+                # Database restarts etc.: keep the worker alive and retry
+                logger.error(f"Worker job {job.__name__} failed: {e}")
+            next_run[job] = time.monotonic() + interval
+        time.sleep(1)
+
+
+def migrate(revision: str = "head"):
+    failures = run_tenant_migrations(engine, revision)
+    for schema, error in sorted(failures.items()):
+        print(f"FAILED {schema}: {error}")
+    # Rerun to retry the failed schemas; finished ones are skipped
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrate"]:
+        migrate(*sys.argv[2:3])
+    else:
+        main()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useCart } from '../context/CartContext';
 import { BrandButton } from './common/BrandButton';
 import { X, ShoppingBag, Trash2, User, Hash } from 'lucide-react';
@@ -17,6 +17,9 @@ export function CartDrawer() {
     const [customerName, setCustomerName] = useState('');
     const [tableNumber, setTableNumber] = useState('');
     const [isSubmitting, setIsSubmitting] = useState(false);
+    // Idempotency-Key of the current checkout: retries of the same cart reuse
+    // it, so a timed out request that did go through isn't placed twice
+    const checkout = useRef<{ body: string; key: string } | null>(null);
 
     // PRE-FILL FOR DEMO
     useEffect(() => {
@@ -47,9 +50,19 @@ export function CartDrawer() {
             }))
         };
 
+        const body = JSON.stringify(payload);
+        if (checkout.current?.body !== body) {
+            // randomUUID only exists in secure contexts (HTTPS, localhost)
+            const key = crypto.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+            checkout.current = { body, key };
+        }
+
         try {
             // 2. Prepare headers
-            const headers: HeadersInit = { 'Content-Type': 'application/json' };
+            const headers: HeadersInit = {
+                'Content-Type': 'application/json',
+                'Idempotency-Key': checkout.current.key,
+            };
 
             // 3. Inject Token if present (Crucial for Demo Isolation)
             if (token) {
@@ -59,7 +72,7 @@ export function CartDrawer() {
             const res = await fetch('/api/v1/store/orders', {
                 method: 'POST',
                 headers: headers, // <--- Use the headers object
-                body: JSON.stringify(payload)
+                body
             });
 
             if (res.ok) {
@@ -71,6 +84,7 @@ export function CartDrawer() {
                     item_count: items.length
                 });
                 setActiveOrderId(data.id);
+                checkout.current = null;
                 clearCart();
                 setTableNumber('');
                 toggleDrawer(false);
@@ -13,7 +13,7 @@ interface ModifierGroup {
     id: string;
     name: string;
     min_selection: number;
-    max_selection: number;
+    max_selection: number | null; // null = no limit
     options: ModifierOption[];
 }
 
@@ -48,6 +48,11 @@ export const ItemDetailModal: React.FC<ItemDetailModalProps> = ({
 
     // --- Helpers ---
 
+    // The server rejects selections above max_selection: stop extra ticks here
+    const isGroupFull = (group: ModifierGroup) =>
+        group.max_selection != null
+        && (selections[group.id] || []).length >= group.max_selection;
+
     const handleOptionToggle = (group: ModifierGroup, optionId: string) => {
         setSelections(prev => {
             const current = prev[group.id] || [];
@@ -60,6 +65,8 @@ export const ItemDetailModal: React.FC<ItemDetailModalProps> = ({
             // Checkbox Logic
             if (current.includes(optionId)) {
                 return { ...prev, [group.id]: current.filter(id => id !== optionId) };
+            } else if (group.max_selection != null && current.length >= group.max_selection) {
+                return prev;
             } else {
                 return { ...prev, [group.id]: [...current, optionId] };
             }
@@ -83,6 +90,7 @@ export const ItemDetailModal: React.FC<ItemDetailModalProps> = ({
         for (const group of item.modifier_groups) {
             const count = (selections[group.id] || []).length;
             if (count < group.min_selection) return false;
+            if (group.max_selection != null && count > group.max_selection) return false;
         }
         return true;
     };
@@ -165,10 +173,14 @@ export const ItemDetailModal: React.FC<ItemDetailModalProps> = ({
                                     {group.min_selection > 0 && (
                                         <span className="text-xs bg-primary/10 text-primary px-2 py-1 rounded font-bold uppercase">Required</span>
                                     )}
+                                    {group.min_selection === 0 && group.max_selection != null && group.max_selection > 1 && (
+                                        <span className="text-xs text-text-muted">Up to {group.max_selection}</span>
+                                    )}
                                 </div>
                                 <div className="space-y-2">
                                     {group.options.map((opt) => {
                                         const isSelected = (selections[group.id] || []).includes(opt.id);
+                                        const isBlocked = !isSelected && group.max_selection !== 1 && isGroupFull(group);
                                         return (
                                             <div
                                                 key={opt.id}
@@ -176,7 +188,9 @@ export const ItemDetailModal: React.FC<ItemDetailModalProps> = ({
                                                 className={`
                                                     flex justify-between items-center p-3 rounded cursor-pointer border transition-all
                                                     ${isSelected ? 'border-primary bg-primary/5' : 'border-border hover:bg-gray-50'}
+                                                    ${isBlocked ? 'opacity-50 cursor-not-allowed' : ''}
                                                 `}
+                                                aria-disabled={isBlocked}
                                             >
                                                 <div className="flex items-center gap-3">
                                                     <div className={`w-5 h-5 rounded-full border flex items-center justify-center ${isSelected ? 'border-primary bg-primary' : 'border-gray-400'}`}>
@@ -1,4 +1,4 @@
-import { useEffect, useState, useRef } from 'react';
+import { useCallback, useEffect, useState, useRef } from 'react';
 import { useTenantConfig } from '../../hooks/useTenantConfig';
 import { useAuth } from '../../context/AuthContext';
 import { Wifi, WifiOff, Loader2 } from 'lucide-react';
@@ -48,6 +48,8 @@ export function KitchenDisplay() {
     // Refs
     const ws = useRef<WebSocket | null>(null);
     const audioRef = useRef<HTMLAudioElement | null>(null);
+    // Sequence number of the last KDS event applied (sent back as ?since= on reconnect)
+    const lastSeq = useRef<number | null>(null);
 
     // --- 1. Audio & WakeLock Setup ---
     useEffect(() => {
@@ -69,26 +71,28 @@ export function KitchenDisplay() {
     };
 
     // --- 2. Initial Data Fetch (Persistence) ---
-    useEffect(() => {
-        if (!config || !isActive) return;
-
+    const fetchOrders = useCallback(() => {
         const headers: HeadersInit = token ? { 'Authorization': `Bearer ${token}` } : {};
 
-        fetch('/api/v1/store/orders', { headers })
+        return fetch('/api/v1/store/orders', { headers })
             .then(res => res.json())
             .then(data => {
                 setOrders(data);
                 setLoading(false);
             })
             .catch(err => console.error("Failed to fetch KDS orders", err));
-    }, [config, isActive, token]);
+    }, [token]);
+
+    useEffect(() => {
+        if (!config || !isActive) return;
+        fetchOrders();
+    }, [config, isActive, fetchOrders]);
 
     // --- 3. WebSocket Connection & Sync ---
     useEffect(() => {
         if (!config || !isActive) return;
 
         const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-        const wsUrl = `${protocol}://${window.location.host}/api/v1/ws/kitchen${token ? `?token=${token}` : ''}`;
 
         let isMounted = true;
         let reconnectTimeout: ReturnType<typeof setTimeout>;
@@ -97,6 +101,13 @@ export function KitchenDisplay() {
             if (!isMounted) return;
             if (ws.current) ws.current.close();
 
+            // On reconnect the server replays only the events we missed
+            const params = new URLSearchParams();
+            if (token) params.set('token', token);
+            if (lastSeq.current !== null) params.set('since', String(lastSeq.current));
+            const query = params.toString();
+            const wsUrl = `${protocol}://${window.location.host}/api/v1/ws/kitchen${query ? `?${query}` : ''}`;
+
             ws.current = new WebSocket(wsUrl);
 
             ws.current.onopen = () => {
@@ -107,6 +118,25 @@ export function KitchenDisplay() {
                 if (!isMounted) return;
                 const data = JSON.parse(event.data);
 
+                // Current position in the tenant's event stream
+                if (data.event === 'sync') {
+                    lastSeq.current = data.seq;
+                    return;
+                }
+
+                // Missed too much while offline: full refetch
+                if (data.event === 'resync') {
+                    lastSeq.current = data.seq;
+                    fetchOrders();
+                    return;
+                }
+
+                // Replayed and live events can overlap: apply each once
+                if (typeof data.seq === 'number') {
+                    if (lastSeq.current !== null && data.seq <= lastSeq.current) return;
+                    lastSeq.current = data.seq;
+                }
+
                 if (data.event === 'new_order') {
                     setOrders(prev => {
                         if (prev.some(o => o.id === data.order.id)) return prev;
@@ -141,7 +171,7 @@ export function KitchenDisplay() {
             clearTimeout(reconnectTimeout);
             ws.current?.close();
         };
-    }, [config, isActive, token]);
+    }, [config, isActive, token, fetchOrders]);
 
     // --- 4. Logic ---
     const handleStatusChange = async (orderId: string, newStatus: string) => {